@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Compares the size of review list pages and the CPU time spent on them in JSON and MessagePack, uncompressed and
+compressed with gzip and brotli as done by ``CompressionMiddleware``. Encoding and compressing is paid by the
+server, decoding and decompressing by the client. Runs on an in-memory database.
+
+    $ python benchmarks/formats.py --sizes 100 1000 10000
+"""
+import argparse
+import gzip
+import json
+import os
+
+from utils import best_of, setup_django
+
+setup_django()
+
+from django.core.management import call_command  # noqa E402
+from django.utils.text import compress_string  # noqa E402
+from rest_framework.renderers import JSONRenderer  # noqa E402
+
+from review.compat import brotli, msgpack  # noqa E402
+from review.compression import BROTLI_QUALITY  # noqa E402
+from review.models import Review  # noqa E402
+from review.renderers import MessagePackRenderer  # noqa E402
+from review.serializers import review_values_serializer  # noqa E402
+
+
+def get_formats():
+    formats = {'json': (JSONRenderer().render, json.loads)}
+    if msgpack is not None:
+        formats['msgpack'] = (MessagePackRenderer().render, lambda content: msgpack.unpackb(content, raw=False))
+    return formats
+
+
+def get_encodings():
+    encodings = {
+        'identity': (lambda content: content, lambda content: content),
+        'gzip': (compress_string, gzip.decompress),
+    }
+    if brotli is not None:
+        encodings['br'] = (lambda content: brotli.compress(content, quality=BROTLI_QUALITY), brotli.decompress)
+    return encodings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Number of reviews.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    call_command("seed_reviews", users=1, reviews=max(args.sizes), seed=0, stdout=open(os.devnull, "w"))
+    formats, encodings = get_formats(), get_encodings()
+    if msgpack is None:
+        print("msgpack is not installed, only JSON is measured.")
+    if brotli is None:
+        print("brotli is not installed, only gzip is measured.")
+
+    print(f"{'reviews':>8} {'format':<8} {'encoding':<9} {'bytes':>10} {'ratio':>6} {'server':>10} {'client':>10}")
+    for size in sorted(args.sizes):
+        page = {
+            'next': "http://localhost:8000/api/v1/reviews/?cursor=cD0yMDE4LTEyLTE4",
+            'previous': None,
+            'results': review_values_serializer.serialize(Review.objects.all()[:size]),
+        }
+        baseline = None
+        for format_name, (render, load) in formats.items():
+            content = render(page)
+            encode_time = best_of(args.repeat, lambda: render(page))
+            decode_time = best_of(args.repeat, lambda: load(content))
+            for encoding_name, (compress, decompress) in encodings.items():
+                compressed = compress(content)
+                server = encode_time + best_of(args.repeat, lambda: compress(content))
+                client = decode_time + best_of(args.repeat, lambda: decompress(compressed))
+                baseline = baseline or len(compressed)
+                print(f"{size:>8} {format_name:<8} {encoding_name:<9} {len(compressed):>10} "
+                      f"{len(compressed) / baseline:>6.2f} {server * 1000:>8.2f}ms {client * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
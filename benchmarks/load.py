@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Load benchmark of the review API through the Django test client.
+
+The database is seeded with ``seed_reviews`` up to every requested size, then the list, detail and create
+endpoints are called as the heaviest reviewer. The latency percentiles, the throughput and the number of SQL
+queries per request are printed and can be saved as JSON. Comparing with an earlier result exits with an error
+if the p95 latency of any scenario got worse by more than the threshold.
+
+    $ python benchmarks/load.py --sizes 1000 10000 100000 --output after.json --compare before.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from utils import percentile, setup_django
+
+setup_django()
+
+import django  # noqa E402
+from django.core.management import call_command  # noqa E402
+from django.db import connection  # noqa E402
+from django.test import Client  # noqa E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa E402
+from rest_framework.authtoken.models import Token  # noqa E402
+
+from review.models import Review  # noqa E402
+
+REVIEW_PAYLOAD = {'rating': 4, 'title': "benchmark", 'summary': "created by the benchmark", 'company_name': "Bench"}
+
+
+def scenarios(user, rng):
+    ids = list(Review.objects.filter(reviewer=user).values_list("id", flat=True)[:1000])
+    return {
+        'list': lambda client: client.get("/api/v1/reviews/"),
+        'list_filtered': lambda client: client.get("/api/v1/reviews/", {'rating': 5}),
+        'detail': lambda client: client.get(f"/api/v1/reviews/{rng.choice(ids)}/"),
+        'create': lambda client: client.post("/api/v1/reviews/", REVIEW_PAYLOAD, content_type="application/json"),
+    }
+
+
+def run(request, client, count):
+    latencies, queries = [], 0
+    started = time.perf_counter()
+    for _ in range(count):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = request(client)
+            latencies.append(time.perf_counter() - start)
+        assert response.status_code < 300, response.status_code
+        queries += len(captured.captured_queries)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'throughput': count / elapsed,
+        'queries': queries / count,
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for size, scenario_results in results.items():
+        for scenario, result in scenario_results.items():
+            previous = baseline.get(size, {}).get(scenario)
+            if previous and result['p95'] > previous['p95'] * (1 + threshold):
+                regressions.append(
+                    f"{scenario} at {size} rows: p95 {previous['p95'] * 1000:.2f}ms -> {result['p95'] * 1000:.2f}ms"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Number of reviews.")
+    parser.add_argument("--users", type=int, default=50, help="Number of seeded users.")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per scenario.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Save the results into this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with this earlier JSON output.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 slowdown, 0.2 means 20%%.")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    rng = random.Random(args.seed)
+    results = {}
+    seeded = 0
+    for size in sorted(args.sizes):
+        call_command("seed_reviews", users=0 if seeded else args.users, reviews=size - seeded, seed=args.seed + size,
+                     prefix="benchmark", stdout=open("/dev/null", "w"))
+        seeded = size
+        token = Token.objects.select_related("user").filter(user__username__startswith="benchmark-") \
+            .order_by("user_id").first()
+        client = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        results[str(size)] = {}
+        for name, request in scenarios(token.user, rng).items():
+            result = results[str(size)][name] = run(request, client, args.requests)
+            print(f"{size:>8} {name:<14} p50 {result['p50'] * 1000:7.2f}ms  p95 {result['p95'] * 1000:7.2f}ms  "
+                  f"p99 {result['p99'] * 1000:7.2f}ms  {result['throughput']:8.1f} req/s  "
+                  f"{result['queries']:.1f} queries")
+        # the created reviews count towards the next size
+        seeded += args.requests
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'requests': args.requests,
+                'results': results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)['results'], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Compares the serialization of the review list by ``ReviewSerializer`` and by the ``values_list()`` based
+``review_values_serializer``, both including the query. Runs on an in-memory database.
+
+    $ python benchmarks/serializer.py --sizes 1000 10000 100000
+"""
+import argparse
+
+from utils import best_of, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa E402
+from rest_framework.renderers import JSONRenderer  # noqa E402
+
+from review.models import Review  # noqa E402
+from review.serializers import ReviewSerializer, review_values_serializer  # noqa E402
+
+
+def seed(user, count):
+    Review.objects.bulk_create(
+        Review(title=f"title {i}", summary="summary " * 50, rating=i % 5 + 1, company_name=f"company {i % 100}",
+               reviewer=user)
+        for i in range(count)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    user = User.objects.create(username="benchmark")
+    queryset = Review.objects.filter(reviewer=user)
+
+    def model_serializer():
+        return ReviewSerializer(queryset.select_related("reviewer"), many=True).data
+
+    def values_serializer():
+        return review_values_serializer.serialize(queryset)
+
+    assert JSONRenderer().render(model_serializer()) == JSONRenderer().render(values_serializer())
+
+    print(f"{'rows':>8} {'ModelSerializer':>16} {'values':>10} {'speedup':>8}")
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed(user, size - seeded)
+        seeded = size
+        slow = best_of(args.repeat, model_serializer)
+        fast = best_of(args.repeat, values_serializer)
+        print(f"{size:>8} {slow:>15.3f}s {fast:>9.3f}s {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Throughput of the WSGI (uwsgi, review.wsgi) and the ASGI (uvicorn, review.asgi) deployments with the production
+settings on an SQLite database file, under an increasing number of concurrent clients.
+
+Every client is a thread with a keep-alive connection sending the requests of a scenario back to back as the
+heaviest reviewer. Both servers get the same number of worker processes and the same number of threads per
+process (uwsgi threads or the ASGI thread pool). The clients run on the same machine, for numbers closer to
+production run them on another one with --host of a server started by hand.
+
+    $ python benchmarks/servers.py --clients 1 8 32 --workers 2 --threads 8 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from utils import percentile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = ("wsgi", "asgi")
+SCENARIOS = ("list", "detail", "create")
+REVIEW_PAYLOAD = json.dumps(
+    {'rating': 4, 'title': "benchmark", 'summary': "created by the benchmark", 'company_name': "Bench"}
+)
+SETTINGS = """
+from review.settings.production import *  # noqa
+
+DATABASES['default']['NAME'] = {path!r}
+"""
+
+
+def prepare(directory, reviews):
+    """
+    Create and seed the database, return the environment of the servers, the token and some review ids.
+    """
+    path = os.path.join(directory, "review.db")
+    with open(os.path.join(directory, "benchmark_settings.py"), "w") as f:
+        f.write(SETTINGS.format(path=path))
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([directory, ROOT_DIR]),
+        DJANGO_SETTINGS_MODULE="benchmark_settings",
+        DJANGO_SECRET_KEY="benchmark",
+        DJANGO_ALLOWED_HOSTS="127.0.0.1,localhost",
+        DJANGO_REVIEW_INGEST_SPOOL=os.path.join(directory, "ingest.db"),
+        DJANGO_REVIEW_CACHE_DATABASE_URL=f"sqlite:///{os.path.join(directory, 'cache.db')}",
+    )
+    manage = [sys.executable, os.path.join(ROOT_DIR, "manage.py")]
+    subprocess.run(manage + ["migrate", "-v0"], env=env, check=True)
+    subprocess.run(manage + ["createcachetable", "--database", "cache"], env=env, check=True)
+    subprocess.run(manage + ["seed_reviews", "--users", "20", "--reviews", str(reviews), "--seed", "0"],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+
+    connection = sqlite3.connect(path)
+    reviewer_id, = connection.execute(
+        "SELECT reviewer_id FROM review_review GROUP BY reviewer_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    token, = connection.execute("SELECT key FROM authtoken_token WHERE user_id = ?", (reviewer_id, )).fetchone()
+    ids = [row[0] for row in connection.execute(
+        "SELECT id FROM review_review WHERE reviewer_id = ? LIMIT 1000", (reviewer_id, )
+    )]
+    connection.close()
+    return env, token, ids
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(server, port, args, env):
+    if server == "wsgi":
+        uwsgi = shutil.which("uwsgi") or os.path.join(os.path.dirname(sys.executable), "uwsgi")
+        command = [uwsgi, "--http", f"127.0.0.1:{port}", "--module", "review.wsgi:application",
+                   "--master", "--processes", str(args.workers), "--threads", str(args.threads),
+                   "--http-keepalive", "--disable-logging", "--die-on-term", "--chdir", ROOT_DIR]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "review.asgi:application", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(args.workers), "--no-access-log",
+                   "--log-level", "warning"]
+        env = dict(env, DJANGO_ASGI_THREADS=str(args.threads))
+    process = subprocess.Popen(command, env=env, cwd=ROOT_DIR, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"The {server} server did not start.")
+
+
+def client(port, scenario, token, ids, deadline, results):
+    headers = {'Authorization': f"Token {token}", 'Content-Type': "application/json"}
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies, errors, index = [], 0, 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            if scenario == "list":
+                connection.request("GET", "/api/v1/reviews/", headers=headers)
+            elif scenario == "detail":
+                index += 1
+                connection.request("GET", f"/api/v1/reviews/{ids[index % len(ids)]}/", headers=headers)
+            else:
+                connection.request("POST", "/api/v1/reviews/", REVIEW_PAYLOAD, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    results.append((latencies, errors))
+
+
+def measure(port, scenario, clients, token, ids, duration):
+    results = []
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=client, args=(port, scenario, token, ids, deadline, results))
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = [latency for thread_latencies, _ in results for latency in thread_latencies]
+    return {
+        'throughput': len(latencies) / duration,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=SERVERS)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="Numbers of concurrent clients.")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes of the servers.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per worker process.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run every measurement for.")
+    parser.add_argument("--reviews", type=int, default=20000, help="Number of reviews created beforehand.")
+    parser.add_argument("--directory", help="Create the database file in this directory, it should be on the same "
+                                            "kind of disk as the production database.")
+    args = parser.parse_args()
+
+    print(f"{'server':<6} {'scenario':<8} {'clients':>7} {'req/s':>9} {'p50':>10} {'p95':>10} {'errors':>6}")
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        env, token, ids = prepare(directory, args.reviews)
+        for server in args.servers:
+            port = free_port()
+            process = start(server, port, args, env)
+            try:
+                # warms up every worker (imports, connections, token cache)
+                measure(port, "list", args.workers * args.threads, token, ids, 1)
+                for scenario in args.scenarios:
+                    for clients in args.clients:
+                        result = measure(port, scenario, clients, token, ids, args.duration)
+                        print(f"{server:<6} {scenario:<8} {clients:>7} {result['throughput']:>9.1f} "
+                              f"{result['p50'] * 1000:>8.2f}ms {result['p95'] * 1000:>8.2f}ms "
+                              f"{result['errors']:>6}", flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Concurrent reads and writes on an SQLite database file, with the default SQLite settings and with the production
+profile (WAL, pragmas and immediate transactions, see review.backends.sqlite3).
+
+Reader processes keep reading a page of reviews while writer processes keep inserting batches of reviews. With
+the default rollback journal the readers have to wait while a writer commits, with WAL they never wait.
+
+    $ python benchmarks/sqlite_concurrency.py --readers 4 --writers 1 --duration 10
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from utils import percentile, setup_django
+
+PROFILES = ("default", "production")
+
+
+def get_databases(profile, path):
+    if profile == "default":
+        return {'default': {'ENGINE': "django.db.backends.sqlite3", 'NAME': path}}
+
+    from review.settings.base import SQLITE_PRAGMAS
+    return {'default': {
+        'ENGINE': "review.backends.sqlite3",
+        'NAME': path,
+        'OPTIONS': {'pragmas': SQLITE_PRAGMAS, 'immediate_transactions': True},
+    }}
+
+
+def prepare(profile, path, reviews):
+    setup_django(get_databases(profile, path))
+    from django.core.management import call_command
+    call_command("seed_reviews", users=20, reviews=reviews, seed=0, stdout=open(os.devnull, "w"))
+
+
+def wait(start_at):
+    time.sleep(max(0, start_at - time.time()))
+
+
+def read(profile, path, start_at, duration, results):
+    setup_django(get_databases(profile, path), migrate=False)
+    from django.db import OperationalError
+    from review.models import Review
+
+    reviewer_id = Review.objects.values_list("reviewer_id", flat=True).order_by("reviewer_id").first()
+    latencies, errors = [], 0
+    wait(start_at)
+    while time.time() < start_at + duration:
+        start = time.perf_counter()
+        try:
+            list(Review.objects.filter(reviewer_id=reviewer_id).values_list("id", "title", "rating")[:100])
+        except OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    results.put(("read", latencies, errors))
+
+
+def write(profile, path, start_at, duration, batch_size, results):
+    setup_django(get_databases(profile, path), migrate=False)
+    from django.db import OperationalError, transaction
+    from review.models import CompanyRating, Review
+
+    reviewer_id = Review.objects.values_list("reviewer_id", flat=True).order_by("reviewer_id").first()
+    latencies, errors = [], 0
+    wait(start_at)
+    while time.time() < start_at + duration:
+        reviews = [
+            Review(reviewer_id=reviewer_id, title="t", summary="s" * 200, rating=3, company_name="concurrency")
+            for _ in range(batch_size)
+        ]
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                Review.objects.bulk_create(reviews)
+                CompanyRating.objects.record(reviews)
+        except OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    results.put(("write", latencies, errors))
+
+
+def run(profile, args):
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        path = os.path.join(directory, "review.db")
+        process = context.Process(target=prepare, args=(profile, path, args.reviews))
+        process.start()
+        process.join()
+
+        results = context.Queue()
+        # every process starts at the same time, after all of them had time to set up Django
+        start_at = time.time() + 2 + (args.readers + args.writers) / 2
+        processes = [context.Process(target=read, args=(profile, path, start_at, args.duration, results))
+                     for _ in range(args.readers)]
+        processes += [
+            context.Process(target=write, args=(profile, path, start_at, args.duration, args.batch_size, results))
+            for _ in range(args.writers)
+        ]
+        for process in processes:
+            process.start()
+        collected = {'read': ([], 0), 'write': ([], 0)}
+        for _ in processes:
+            kind, latencies, errors = results.get()
+            collected[kind] = (collected[kind][0] + latencies, collected[kind][1] + errors)
+        for process in processes:
+            process.join()
+
+    for kind, (latencies, errors) in collected.items():
+        if not latencies:
+            continue
+        print(f"{profile:<11} {kind:<6} {len(latencies) / args.duration:8.1f}/s  "
+              f"p50 {percentile(latencies, 50) * 1000:7.2f}ms  p99 {percentile(latencies, 99) * 1000:8.2f}ms  "
+              f"max {max(latencies) * 1000:8.2f}ms  {errors} error(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=PROFILES)
+    parser.add_argument("--readers", type=int, default=4, help="Number of reader processes.")
+    parser.add_argument("--writers", type=int, default=1, help="Number of writer processes.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run for.")
+    parser.add_argument("--reviews", type=int, default=20000, help="Number of reviews created beforehand.")
+    parser.add_argument("--batch-size", type=int, default=200, help="Number of reviews inserted per transaction.")
+    parser.add_argument("--directory", help="Create the database files in this directory, it should be on the same "
+                                            "kind of disk as the production database.")
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
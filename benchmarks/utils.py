@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def setup_django(databases=None, migrate=True):
+    """
+    Set up Django with the test settings (in-memory database) unless DJANGO_SETTINGS_MODULE says otherwise,
+    ``databases`` replaces the DATABASES setting.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "review.settings.test")
+
+    import django
+    if databases is not None:
+        from django.conf import settings
+        settings.DATABASES = databases
+    django.setup()
+
+    if migrate:
+        from django.core.management import call_command
+        call_command("migrate", verbosity=0)
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of the values.
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def best_of(repeat, func):
+    """
+    Shortest of ``repeat`` runs of ``func`` in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
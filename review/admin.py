@@ -1,10 +1,72 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import admin
-from review.models import Review
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Sum
+from django.utils.functional import cached_property
+
+from review.models import ArchivedReview, CompanyRating, Review
+from review.search import filter_reviews
+
+
+def changelist_cache_key(name, queryset, *parts):
+    """
+    Cache key of something computed out of a changelist queryset, the SQL tells the filters apart.
+    """
+    digest = hashlib.sha1("|".join([str(queryset.query), *map(str, parts)]).encode()).hexdigest()
+    return f"review:admin:{name}:{digest}"
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Counting millions of rows on every page of the changelist is slow: the total comes from the company ratings,
+    which are kept up to date when reviews are created and deleted, less the archived reviews, and the counts are
+    cached for ``REVIEW_ADMIN_CACHE_TIMEOUT`` seconds.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            # the ratings count the archived reviews too
+            total = CompanyRating.objects.aggregate(count=Sum("review_count"))['count'] or 0
+            return max(total - self.cached_count(ArchivedReview.objects.all()), 0)
+
+        try:
+            return self.cached_count(queryset)
+        except EmptyResultSet:
+            return 0
+
+    @staticmethod
+    def cached_count(queryset):
+        cache = caches[settings.REVIEW_CACHE_ALIAS]
+        key = changelist_cache_key("count", queryset)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.REVIEW_ADMIN_CACHE_TIMEOUT)
+        return count
 
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ("id", "rating", "title", "company_name", "reviewer")
+    list_select_related = ("reviewer", )
     readonly_fields = ("ip_address", )
     raw_id_fields = ("reviewer", )
+    # the drilldown is cached, see review.templatetags.review_admin
     date_hierarchy = "created_at"
+    search_fields = ("^title", "^company_name")
+    paginator = CachedCountPaginator
+    # the total is shown by the paginator already, this would be a second count
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # the words of the title and the company name are looked up in the full-text index, see review.search
+        if connection.vendor != "sqlite":
+            return super().get_search_results(request, queryset, search_term)
+        return filter_reviews(queryset, search_term, columns=("title", "company_name"), prefix=True), False
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ReviewConfig(AppConfig):
+    name = "review"
+
+    def ready(self):
+        from review import signals  # noqa F401
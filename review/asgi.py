@@ -0,0 +1,168 @@
+"""
+ASGI config for Review App project.
+
+It exposes the ASGI application as a module-level variable named ``application``, to be run by an ASGI server:
+
+    $ uvicorn review.asgi:application --workers 4
+
+Django 2.1 has neither an ASGI handler nor async views, so ``ASGIApplication`` runs the usual Django handler (the
+same views, middleware and ORM) on a bounded pool of ``ASGI_THREADS`` threads. The event loop of the server
+accepts the connections, reads the request bodies and writes the responses, so a slow client doesn't hold a
+thread, only the Django work does. Each thread keeps its own database connection, the pool bounds their number.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+# see review.wsgi
+app_path = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.append(os.path.join(app_path, 'review'))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "review.settings.production")
+
+# chunks of a streaming response buffered between the thread producing them and the event loop sending them
+STREAM_BUFFER = 16
+
+
+class ASGIApplication:
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope['type'] == "http":
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']}.")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == "lifespan.startup":
+                await send({'type': "lifespan.startup.complete"})
+            elif message['type'] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({'type': "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == "http.disconnect":
+                body.close()
+                return
+            body.write(message.get('body', b""))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_event_loop()
+        status, headers, response = await loop.run_in_executor(
+            self.executor, self.run_wsgi, self.get_environ(scope, body)
+        )
+        await send({'type': "http.response.start", 'status': status, 'headers': headers})
+        if isinstance(response, bytes):
+            await send({'type': "http.response.body", 'body': response})
+            return
+
+        # the chunks of a streaming response may come from the database, they are produced in one thread
+        queue = asyncio.Queue(maxsize=STREAM_BUFFER)
+        produced = loop.run_in_executor(self.executor, self.produce, response, loop, queue)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                await send({'type': "http.response.body", 'body': chunk, 'more_body': True})
+            await send({'type': "http.response.body", 'body': b""})
+        finally:
+            # the producer must not be left waiting for room in the buffer when sending failed
+            while not produced.done():
+                if queue.empty():
+                    await asyncio.sleep(0.01)
+                else:
+                    queue.get_nowait()
+        await produced
+
+    def run_wsgi(self, environ):
+        """
+        Run the request in a thread of the pool and return the status, the headers and the content, or the
+        response itself when it's streaming.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(" ", 1)[0])
+            started['headers'] = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            environ['wsgi.input'].close()
+            if getattr(response, "streaming", False):
+                return started['status'], started['headers'], response
+            content = b"".join(response)
+        except BaseException:
+            response.close()
+            raise
+        # sends request_finished, which closes the expired database connections of this thread
+        response.close()
+        return started['status'], started['headers'], content
+
+    @staticmethod
+    def produce(response, loop, queue):
+        try:
+            for chunk in response:
+                if chunk:
+                    asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+        finally:
+            response.close()
+            asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+    @staticmethod
+    def get_environ(scope, body):
+        server_name, server_port = scope.get('server') or ("localhost", 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ""),
+            # WSGI strings are bytes decoded as latin-1
+            'PATH_INFO': scope['path'].encode("utf8").decode("latin1"),
+            'QUERY_STRING': scope['query_string'].decode("latin1"),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', "http"),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+        for name, value in scope['headers']:
+            name, value = name.decode("latin1").upper().replace("-", "_"), value.decode("latin1")
+            if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                name = f"HTTP_{name}"
+            if name in environ:
+                value = f"{environ[name]}{'; ' if name == 'HTTP_COOKIE' else ','}{value}"
+            environ[name] = value
+        return environ
+
+
+def get_asgi_application():
+    # sets up Django, the settings are available after it
+    wsgi_application = get_wsgi_application()
+    return ASGIApplication(wsgi_application, settings.ASGI_THREADS)
+
+
+application = get_asgi_application()
@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TTLCache:
+    """
+    Bounded, thread safe LRU mapping where every entry expires ``ttl`` seconds after it was set.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                return None
+
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+token_cache = TTLCache(settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL)
+# concurrent requests with a token missing from token_cache (like the ones of a client on the threads of
+# review.asgi) look it up only once, the lock is picked by the token
+_lookup_locks = [threading.Lock() for _ in range(64)]
+
+
+def _get_shared_cache():
+    if settings.TOKEN_AUTH_CACHE_ALIAS is None:
+        return None
+    return caches[settings.TOKEN_AUTH_CACHE_ALIAS]
+
+
+def _shared_cache_key(key):
+    # never put the raw token into a cache that may be shared with other services
+    return "review:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+    shared_cache = _get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(_shared_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement of ``TokenAuthentication`` which keeps the resolved token and user in memory.
+
+    Lookups go to a per process LRU first, then to the Django cache configured by ``TOKEN_AUTH_CACHE_ALIAS``
+    (if any) and only hit the database on a miss. Entries are dropped by the signal handlers in
+    ``review.signals`` when the token or its user changes, other processes see the change when their
+    local entry expires after ``TOKEN_AUTH_CACHE_TTL`` seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        with _lookup_locks[hash(key) % len(_lookup_locks)]:
+            # looked up by another thread while this one was waiting
+            cached = token_cache.get(key)
+            if cached is not None:
+                return cached
+            return self.lookup(key)
+
+    def lookup(self, key):
+        shared_cache = _get_shared_cache()
+        if shared_cache is not None:
+            cached = shared_cache.get(_shared_cache_key(key))
+            if cached is not None:
+                token_cache.set(key, cached)
+                return cached
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user, token))
+        if shared_cache is not None:
+            shared_cache.set(_shared_cache_key(key), (user, token), settings.TOKEN_AUTH_CACHE_TTL)
+
+        return user, token
@@ -0,0 +1,32 @@
+"""
+SQLite backend applying the ``pragmas`` of the database's ``OPTIONS`` to every new connection.
+
+    'OPTIONS': {'pragmas': {'journal_mode': "WAL", 'busy_timeout': 5000}, 'immediate_transactions': True}
+
+With ``immediate_transactions`` the transactions (``atomic`` blocks) start with ``BEGIN IMMEDIATE``, so they take
+the write lock when they start, waiting up to ``busy_timeout`` for it, instead of failing with "database is
+locked" when they try to upgrade a read lock to a write lock in the middle of the transaction. The transactions
+which only read take the write lock as well, there is no telling in advance whether an ``atomic`` block writes.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # these are not arguments of sqlite3.connect()
+        params.pop("pragmas", None)
+        params.pop("immediate_transactions", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get("pragmas", {}).items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict['OPTIONS'].get("immediate_transactions"):
+            self.cursor().execute("BEGIN IMMEDIATE")
+        else:
+            super()._start_transaction_under_autocommit()
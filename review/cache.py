@@ -0,0 +1,74 @@
+"""
+Cache of the serialized representation of reviews.
+
+Reviews can only be changed by the staff in the admin, their representation is dropped when they are saved or
+deleted (see ``review.signals``), which takes a cache shared by the worker processes (see the production
+settings). The reviewer's username is not stored, only the id of the reviewer: reviews are
+only ever shown to their reviewer, who is the requesting user, so the name is filled in from ``request.user``
+and renaming a user doesn't leave stale entries behind.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+REVIEWER_FIELD = "reviewer"
+
+
+def _get_cache():
+    return caches[settings.REVIEW_CACHE_ALIAS]
+
+
+def _key(pk):
+    return f"review:representation:{pk}"
+
+
+def get_representations(ids, reviewer, serialize, fields=None, cached=True):
+    """
+    Return the representation of the reviews of ``reviewer`` with the given ids, in the same order.
+
+    The ones missing from the cache are serialized with one ``serialize(missing_ids)`` call, which has to return
+    the representations of (only) the reviewer's reviews, and are put into the cache. With ``fields`` only those
+    fields are returned, ``serialize`` may then return only those (and the id), such partial representations are
+    not cached. With ``cached=False`` the cache is not read, all the reviews are serialized.
+    """
+    cache = _get_cache()
+    keys = {pk: _key(pk) for pk in ids}
+    entries = cache.get_many(keys.values()) if cached else {}
+
+    found = {}
+    for pk, key in keys.items():
+        entry = entries.get(key)
+        if entry is not None and entry[0] == reviewer.pk:
+            found[pk] = entry[1]
+
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        serialized = serialize(missing)
+        if fields is None:
+            set_representations(serialized, reviewer)
+        for data in serialized:
+            found[data['id']] = data
+
+    representations = []
+    for pk in ids:
+        if pk in found:
+            if fields is None:
+                data = found[pk].copy()
+            else:
+                data = {name: value for name, value in found[pk].items() if name in fields}
+            if fields is None or REVIEWER_FIELD in fields:
+                data[REVIEWER_FIELD] = reviewer.username
+            representations.append(data)
+    return representations
+
+
+def set_representations(representations, reviewer):
+    entries = {}
+    for data in representations:
+        data = data.copy()
+        data.pop(REVIEWER_FIELD, None)
+        entries[_key(data['id'])] = (reviewer.pk, data)
+    _get_cache().set_many(entries, settings.REVIEW_CACHE_TIMEOUT)
+
+
+def delete_representation(pk):
+    _get_cache().delete(_key(pk))
@@ -0,0 +1,13 @@
+"""
+Optional dependencies, the modules are None when they are not installed.
+"""
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
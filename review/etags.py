@@ -0,0 +1,38 @@
+"""
+ETag functions for ``django.views.decorators.http.condition``.
+
+Reviews can only be changed by the staff in the admin, which sets ``updated_at`` (so does creating them), so the
+list of a reviewer only changes when a review is created or edited (the newest ``updated_at`` moves) or deleted
+(the count drops). Both are read from the ``(reviewer, updated_at)`` index without touching the rows, which is a
+lot cheaper than serializing the response and hashing it. The archived reviews only change when reviews are moved
+to the archive, which drops the count as well.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+from review.models import Review
+
+
+def _hash(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _representation(request):
+    # the same data rendered differently (or a different page of it) needs a different ETag
+    return request.accepted_renderer.format, request.get_full_path(), request.user.username
+
+
+def review_list_etag(request, *args, **kwargs):
+    stamp = Review.objects.filter(reviewer=request.user).aggregate(count=Count("id"), latest=Max("updated_at"))
+    return _hash(request.user.pk, stamp['count'], stamp['latest'], *_representation(request))
+
+
+def review_detail_etag(request, pk, *args, **kwargs):
+    updated_at = Review.objects.filter(pk=pk, reviewer=request.user).values_list("updated_at", flat=True).first()
+    # the view doesn't answer from the cache without the row, which may have been deleted (or archived)
+    request.review_found = updated_at is not None
+    if updated_at is None:
+        # missing or someone else's review, let the view respond with the error
+        return None
+    return _hash(pk, updated_at, *_representation(request))
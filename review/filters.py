@@ -0,0 +1,60 @@
+from django.utils.encoding import force_text
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.serializers import Serializer, CharField, IntegerField, DateTimeField
+
+
+class ReviewFilterSerializer(Serializer):
+    company_name = CharField(required=False, max_length=255, help_text="Name of the reviewed company.")
+    rating = IntegerField(required=False, min_value=1, max_value=5, help_text="Rating of the review.")
+    rating_min = IntegerField(required=False, min_value=1, max_value=5, help_text="Lowest rating of the review.")
+    rating_max = IntegerField(required=False, min_value=1, max_value=5, help_text="Highest rating of the review.")
+    created_after = DateTimeField(required=False, help_text="Reviews created at or after this time.")
+    created_before = DateTimeField(required=False, help_text="Reviews created before this time.")
+
+    def validate(self, attrs):
+        if attrs.get("rating_min", 1) > attrs.get("rating_max", 5):
+            raise ValidationError({'rating_max': ["Ensure this value is greater than or equal to rating_min."]})
+        if "created_after" in attrs and "created_before" in attrs and \
+                attrs["created_after"] >= attrs["created_before"]:
+            raise ValidationError({'created_before': ["Ensure this value is later than created_after."]})
+        return attrs
+
+
+class ReviewFilterBackend(BaseFilterBackend):
+    """
+    Filters the reviews by the query parameters of ``ReviewFilterSerializer``.
+
+    Together with the ``reviewer_id`` of the requesting user every filter can be answered from one of the
+    indexes of ``Review``, see its ``Meta.indexes``.
+    """
+
+    lookups = {
+        'company_name': "company_name",
+        'rating': "rating",
+        'rating_min': "rating__gte",
+        'rating_max': "rating__lte",
+        'created_after': "created_at__gte",
+        'created_before': "created_at__lt",
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = ReviewFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = {self.lookups[name]: value for name, value in serializer.validated_data.items()}
+        return queryset.filter(**filters) if filters else queryset
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        schemas = {CharField: coreschema.String, IntegerField: coreschema.Integer, DateTimeField: coreschema.String}
+        return [
+            coreapi.Field(
+                name=name,
+                required=False,
+                location='query',
+                schema=schemas[type(field)](title=name, description=force_text(field.help_text)),
+            )
+            for name, field in ReviewFilterSerializer().fields.items()
+        ]
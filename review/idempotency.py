@@ -0,0 +1,107 @@
+"""
+``Idempotency-Key`` support of the views creating reviews.
+
+A client which did not get the response of a create (a timeout, a dropped connection) can retry it with the same
+``Idempotency-Key`` header without creating the review twice. The first response sent for a key is stored in the
+``REVIEW_IDEMPOTENCY_CACHE_ALIAS`` cache for ``REVIEW_IDEMPOTENCY_TIMEOUT`` seconds, per user, and the retries get
+it back (with an ``Idempotent-Replayed`` header) without running the view again. While the first request is still in
+flight a retry is rejected with ``409 Conflict``, detected by a marker added to the cache before the view runs.
+Neither errors raised by the view (like an invalid review) nor server errors are stored, those requests run again
+when retried. The cache has to be shared by the worker processes for this to work across workers.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# seconds after which the marker of a request in flight expires, in case its process died
+IN_FLIGHT_TIMEOUT = 60
+IN_FLIGHT = "in-flight"
+# response headers stored with the response
+REPLAYED_HEADERS = ("Location", )
+
+
+class RequestInFlight(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with the same Idempotency-Key is in progress, retry it later."
+    default_code = "request_in_flight"
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "The Idempotency-Key was used with a different request."
+    default_code = "idempotency_key_reused"
+
+
+def _get_cache():
+    return caches[settings.REVIEW_IDEMPOTENCY_CACHE_ALIAS]
+
+
+def _key(user_id, idempotency_key):
+    digest = hashlib.sha1(idempotency_key.encode()).hexdigest()
+    return f"review:idempotency:{user_id}:{digest}"
+
+
+def _fingerprint(request):
+    # the parsed payload, the same review sent as JSON or MessagePack is the same request
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha1(f"{request.method}|{request.path}|{payload}".encode()).hexdigest()
+
+
+def _replay(fingerprint, stored):
+    stored_fingerprint, status_code, data, headers = stored
+    if stored_fingerprint != fingerprint:
+        raise KeyReused()
+    response = Response(data, status=status_code, headers=headers)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view_method):
+    """
+    Decorator of the ``post`` or ``create`` method of an API view honouring the ``Idempotency-Key`` header.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.META.get("HTTP_IDEMPOTENCY_KEY")
+        if idempotency_key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: [f"Ensure this value has 1 to {MAX_KEY_LENGTH} characters."]})
+
+        cache = _get_cache()
+        key = _key(request.user.pk, idempotency_key)
+        fingerprint = _fingerprint(request)
+        # add is atomic, of the concurrent requests only one gets to run the view
+        if not cache.add(key, IN_FLIGHT, IN_FLIGHT_TIMEOUT):
+            stored = cache.get(key)
+            if stored == IN_FLIGHT:
+                raise RequestInFlight()
+            if stored is not None:
+                return _replay(fingerprint, stored)
+            # expired in the meantime, another retry may have got there first
+            if not cache.add(key, IN_FLIGHT, IN_FLIGHT_TIMEOUT):
+                raise RequestInFlight()
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            # nothing was created (an invalid review raises too), the retries run the view again
+            cache.delete(key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(key)
+        else:
+            headers = {name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)}
+            cache.set(key, (fingerprint, response.status_code, response.data, headers),
+                      settings.REVIEW_IDEMPOTENCY_TIMEOUT)
+        return response
+    return wrapper
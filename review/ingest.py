@@ -0,0 +1,212 @@
+"""
+Write-behind queue of created reviews.
+
+With ``REVIEW_INGEST_QUEUE`` on, ``ReviewList`` only validates a new review and appends it to a spool, a separate
+SQLite database at ``REVIEW_INGEST_SPOOL``, then answers ``202 Accepted`` with a tracking id. The spool is
+written with ``synchronous=FULL``, an accepted review survives a crash or a restart of the process.
+
+A background thread of every process (started by its first request, so the reviews left in the spool by a restart
+are flushed without waiting for a new one) or the ``flush_review_queue`` command moves the queued reviews into the
+database with one ``bulk_create`` per batch, so a spike of creates takes the database write lock once per batch
+instead of once per review. Entries are claimed before they are flushed and a claim expires after ``CLAIM_TIMEOUT``
+seconds, so the entries of a flusher that died are picked up by another one. A review keeps its tracking id in
+``Review.ingest_id``, which makes flushing the same entry twice a no-op and tells whether an entry made it into the
+database, even if the flusher died before removing it from the spool. uwsgi doesn't run the threads started by the
+application without ``enable-threads``, see README.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from review.models import Review
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_ingest (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tracking_id TEXT NOT NULL UNIQUE,
+    reviewer_id INTEGER NOT NULL,
+    ip_address TEXT,
+    data TEXT NOT NULL,
+    accepted_at REAL NOT NULL,
+    claimed_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS review_ingest_reviewer_idx ON review_ingest (reviewer_id, tracking_id);
+"""
+
+PENDING = "pending"
+CREATED = "created"
+FAILED = "failed"
+
+
+class ReviewQueue:
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopped = threading.Event()
+
+    def _connection(self):
+        path = settings.REVIEW_INGEST_SPOOL
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.path != path or self._local.pid != os.getpid():
+            # autocommit, the transactions are opened explicitly
+            connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(SCHEMA)
+            self._local.connection, self._local.path, self._local.pid = connection, path, os.getpid()
+        return connection
+
+    def enqueue(self, reviewer_id, ip_address, data):
+        """
+        Durably queue a validated review and return its tracking id.
+        """
+        tracking_id = uuid.uuid4()
+        self._connection().execute(
+            "INSERT INTO review_ingest (tracking_id, reviewer_id, ip_address, data, accepted_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (tracking_id.hex, reviewer_id, ip_address, json.dumps(data), time.time()),
+        )
+        self.start()
+        return tracking_id
+
+    def status(self, reviewer_id, tracking_id):
+        """
+        Return the status, the review id (once created) and the error of a queued review, None if unknown.
+        """
+        review_id = Review.objects.filter(reviewer_id=reviewer_id, ingest_id=tracking_id) \
+            .values_list("id", flat=True).first()
+        if review_id is not None:
+            return {'status': CREATED, 'review': review_id, 'errors': None}
+
+        row = self._connection().execute(
+            "SELECT error FROM review_ingest WHERE reviewer_id = ? AND tracking_id = ?",
+            (reviewer_id, tracking_id.hex),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[0] is not None:
+            return {'status': FAILED, 'review': None, 'errors': json.loads(row[0])}
+        return {'status': PENDING, 'review': None, 'errors': None}
+
+    def summary(self, reviewer_id):
+        """
+        Return the number of pending and failed reviews of the reviewer.
+        """
+        pending, failed = self._connection().execute(
+            "SELECT COUNT(*) - COUNT(error), COUNT(error) FROM review_ingest WHERE reviewer_id = ?", (reviewer_id, )
+        ).fetchone()
+        return {'pending': pending, 'failed': failed}
+
+    def _claim(self, limit):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, tracking_id, reviewer_id, ip_address, data FROM review_ingest "
+                "WHERE error IS NULL AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?",
+                (now - CLAIM_TIMEOUT, limit),
+            ).fetchall()
+            connection.executemany("UPDATE review_ingest SET claimed_at = ? WHERE id = ?",
+                                   [(now, row[0]) for row in rows])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    def flush(self, limit=None):
+        """
+        Move up to ``limit`` (``REVIEW_INGEST_BATCH_SIZE`` by default) queued reviews into the database,
+        return the number of processed entries.
+        """
+        rows = self._claim(limit or settings.REVIEW_INGEST_BATCH_SIZE)
+        if not rows:
+            return 0
+
+        entries = {uuid.UUID(row[1]): row for row in rows}
+        # created by a flusher which died before removing them from the spool
+        existing = set(
+            Review.objects.filter(ingest_id__in=entries).order_by().values_list("ingest_id", flat=True)
+        )
+        reviews = [
+            Review(reviewer_id=row[2], ip_address=row[3], ingest_id=tracking_id, **json.loads(row[4]))
+            for tracking_id, row in entries.items() if tracking_id not in existing
+        ]
+
+        errors = {}
+        try:
+            Review.objects.bulk_create_and_record(reviews)
+        except DatabaseError:
+            # one bad entry (like the one of a deleted user) must not hold back the others
+            for review in reviews:
+                try:
+                    Review.objects.bulk_create_and_record([review])
+                except DatabaseError as e:
+                    errors[review.ingest_id] = {'non_field_errors': [str(e)]}
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany("UPDATE review_ingest SET error = ? WHERE tracking_id = ?",
+                               [(json.dumps(error), tracking_id.hex) for tracking_id, error in errors.items()])
+        connection.executemany("DELETE FROM review_ingest WHERE tracking_id = ?",
+                               [(tracking_id.hex, ) for tracking_id in entries if tracking_id not in errors])
+        connection.execute("COMMIT")
+        return len(rows)
+
+    def start(self):
+        """
+        Start the background flusher of this process, unless ``REVIEW_INGEST_FLUSH_INTERVAL`` is 0.
+        """
+        if not settings.REVIEW_INGEST_FLUSH_INTERVAL or self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self.run, name="review-ingest-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background flusher after its current batch.
+        """
+        with self._lock:
+            self._stopped.set()
+            if self._running():
+                self._thread.join()
+
+    def _running(self):
+        # threads don't survive a fork, a forked worker needs its own
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def run(self):
+        """
+        Flush until stopped, full batches back to back and waiting ``REVIEW_INGEST_FLUSH_INTERVAL`` seconds
+        otherwise.
+        """
+        while not self._stopped.is_set():
+            try:
+                if self.flush() >= settings.REVIEW_INGEST_BATCH_SIZE:
+                    continue
+            except Exception:
+                logger.exception("Flushing the review ingest queue failed.")
+            self._stopped.wait(settings.REVIEW_INGEST_FLUSH_INTERVAL or 1)
+
+
+review_queue = ReviewQueue()
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from review.models import ArchivedReview
+
+
+class Command(BaseCommand):
+    help = "Move the old reviews to the archive, see review.models.ArchivedReview"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.REVIEW_ARCHIVE_AFTER_DAYS,
+                            help="Archive the reviews older than this many days.")
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Number of reviews moved by one transaction.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        for moved in ArchivedReview.objects.archive(before, options['chunk_size']):
+            total += moved
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Archived {total} review(s)...")
+        self.stdout.write(f"Archived {total} review(s) created before {before:%Y-%m-%d %H:%M}.")
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from review.schema import generate_schema, read_schema, source_hash, write_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the schema of the API documentation and write it to a file, see review.schema"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.REVIEW_SCHEMA_PATH,
+                            help="Write the schema to this file.")
+        parser.add_argument("--check", action="store_true",
+                            help="Only check whether the file is up to date, exit with an error if it's not.")
+
+    def handle(self, *args, **options):
+        path, sources = options['output'], source_hash()
+        if options['check']:
+            if read_schema(path, sources) is None:
+                raise CommandError(f"The schema at {path} is missing or out of date.")
+            self.stdout.write(f"The schema at {path} is up to date.")
+            return
+
+        write_schema(path, generate_schema(), sources)
+        self.stdout.write(f"Wrote the schema to {path}.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from review.ingest import review_queue
+
+
+class Command(BaseCommand):
+    help = "Move the reviews waiting in the ingest queue into the database, see review.ingest"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep flushing the queue every REVIEW_INGEST_FLUSH_INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            review_queue.run()
+
+        total = 0
+        while True:
+            flushed = review_queue.flush()
+            if not flushed:
+                break
+            total += flushed
+        self.stdout.write(f"Flushed {total} queued review(s).")
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from review.models import ArchivedReview, CompanyRating, Review, aggregate_company_ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild the company rating summaries from the reviews, or only check them for drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report the drift, do not rebuild.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = aggregate_company_ratings(Review.objects.all(), ArchivedReview.objects.all())
+            stored = {
+                row.pop('company_name'): row for row in CompanyRating.objects.values(*self.summary_fields())
+            }
+
+            drifted = sorted(
+                company_name for company_name in set(expected) | set(stored)
+                if self.normalize(expected.get(company_name)) != self.normalize(stored.get(company_name))
+            )
+            for company_name in drifted:
+                self.stdout.write(
+                    f"{company_name}: stored {stored.get(company_name)}, expected {expected.get(company_name)}"
+                )
+
+            if options['check']:
+                if drifted:
+                    raise CommandError(f"{len(drifted)} company rating(s) drifted.")
+                self.stdout.write("No drift.")
+                return
+
+            CompanyRating.objects.all().delete()
+            CompanyRating.objects.bulk_create(
+                CompanyRating(company_name=company_name, **summary) for company_name, summary in expected.items()
+            )
+            self.stdout.write(f"Rebuilt {len(expected)} company rating(s), fixed {len(drifted)}.")
+
+    @staticmethod
+    def summary_fields():
+        return [field.name for field in CompanyRating._meta.get_fields() if field.name != "id"]
+
+    @staticmethod
+    def normalize(summary):
+        # a summary whose reviews were all deleted is the same as a missing one
+        if not summary or not summary['review_count']:
+            return None
+        return summary
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from review.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index of the reviews (and its triggers if they are missing)."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The search index is only available on SQLite.")
+
+        rebuild_search_index(connection)
+        self.stdout.write("Rebuilt the search index.")
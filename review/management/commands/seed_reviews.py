@@ -0,0 +1,117 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from review.models import Review
+
+ADJECTIVES = (
+    "Blue", "Golden", "Happy", "Quick", "Silent", "Urban", "Royal", "Green", "Bright", "Little", "Grand", "Lucky",
+    "Modern", "Northern", "Cozy", "Smart", "Wild", "Sunny", "Prime", "Classic",
+)
+NOUNS = (
+    "Bakery", "Garage", "Dental", "Pizza", "Hotel", "Fitness", "Books", "Coffee", "Pets", "Florist", "Cleaners",
+    "Plumbing", "Travel", "Sushi", "Barber", "Cinema", "Market", "Tailor", "Insurance", "Movers",
+)
+WORDS = (
+    "service", "staff", "price", "quality", "friendly", "slow", "fast", "great", "terrible", "recommend", "again",
+    "waited", "clean", "rude", "helpful", "value", "experience", "order", "delivery", "location", "parking",
+    "excellent", "average", "disappointed", "amazing", "would", "never", "always", "the", "was", "and", "very",
+)
+# more good reviews than bad ones, like on most review sites
+RATING_WEIGHTS = (5, 7, 15, 33, 40)
+
+
+@contextmanager
+def explicit_created_at():
+    # auto_now_add would overwrite the generated timestamps in bulk_create
+    field = Review._meta.get_field("created_at")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Create users with tokens and realistic reviews for them, for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100,
+                            help="Number of users to create, with 0 the existing users of the prefix are used.")
+        parser.add_argument("--reviews", type=int, default=10000, help="Number of reviews to create.")
+        parser.add_argument("--companies", type=int, default=400, help="Number of distinct companies.")
+        parser.add_argument("--days", type=int, default=365, help="Spread the reviews over this many days.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of rows inserted at once.")
+        parser.add_argument("--prefix", default="seed", help="Prefix of the usernames.")
+        parser.add_argument("--seed", type=int, default=None, help="Seed of the random generator.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['users']:
+            users = self.create_users(options['prefix'], options['users'], options['batch_size'])
+        else:
+            users = list(
+                User.objects.filter(username__startswith=f"{options['prefix']}-").order_by("id")
+                .values_list("id", flat=True)
+            )
+        if not users and options['reviews']:
+            raise CommandError("There are no users to create the reviews for.")
+
+        # a few heavy reviewers write most of the reviews
+        user_weights = [1 / (rank + 1) for rank in range(len(users))]
+        companies = [f"{adjective} {noun}" for adjective in ADJECTIVES for noun in NOUNS]
+        companies = rng.sample(companies, min(options['companies'], len(companies)))
+        now = timezone.now()
+        span = timedelta(days=options['days']).total_seconds()
+
+        created = 0
+        with explicit_created_at():
+            while created < options['reviews']:
+                size = min(options['batch_size'], options['reviews'] - created)
+                reviews = [
+                    Review(
+                        reviewer_id=reviewer_id,
+                        company_name=company_name,
+                        rating=rating,
+                        title=self.sentence(rng, 2, 6)[:64],
+                        summary=self.sentence(rng, 5, 80),
+                        ip_address=f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+                        created_at=now - timedelta(seconds=rng.uniform(0, span)),
+                    )
+                    for reviewer_id, company_name, rating in zip(
+                        rng.choices(users, user_weights, k=size),
+                        rng.choices(companies, k=size),
+                        rng.choices(range(1, 6), RATING_WEIGHTS, k=size),
+                    )
+                ]
+                Review.objects.bulk_create_and_record(reviews)
+                created += size
+                self.stdout.write(f"Created {created}/{options['reviews']} reviews.")
+
+    def create_users(self, prefix, count, batch_size):
+        # unusable password, the users are meant to be used through their tokens
+        password = make_password(None)
+        existing = User.objects.filter(username__startswith=f"{prefix}-").count()
+        last_id = User.objects.aggregate(last_id=Max("id"))['last_id'] or 0
+        User.objects.bulk_create(
+            [User(username=f"{prefix}-{existing + i}", password=password) for i in range(count)], batch_size
+        )
+        users = list(
+            User.objects.filter(id__gt=last_id, username__startswith=f"{prefix}-")
+            .order_by("id").values_list("id", flat=True)
+        )
+        Token.objects.bulk_create([Token(user_id=user_id, key=Token().generate_key()) for user_id in users],
+                                  batch_size)
+        self.stdout.write(f"Created {len(users)} users.")
+        return users
+
+    @staticmethod
+    def sentence(rng, min_words, max_words):
+        return " ".join(rng.choices(WORDS, k=rng.randint(min_words, max_words))).capitalize()
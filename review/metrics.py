@@ -0,0 +1,200 @@
+"""
+Request metrics in the Prometheus text format.
+
+Every process aggregates its own metrics in memory, the only lock taken per request is the one guarding that
+process's dicts. With ``METRICS_DIR`` set (needed when running more than one worker, like uwsgi does) each
+process also writes a snapshot of its metrics to its own file in that directory every ``METRICS_FLUSH_INTERVAL``
+seconds and the metrics endpoint adds up the snapshots of every process, so workers never wait for each other.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+COUNTERS = {
+    'review_http_requests_total': "Number of handled requests.",
+    'review_http_db_queries_total': "Number of SQL queries run while handling requests.",
+    'review_http_db_query_duration_seconds_total': "Time spent in SQL queries while handling requests.",
+}
+HISTOGRAMS = {
+    'review_http_request_duration_seconds': ("Time spent handling requests.", LATENCY_BUCKETS),
+    'review_http_response_size_bytes': ("Size of the response bodies.", SIZE_BUCKETS),
+}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.path = None
+        self.flushed_at = time.monotonic()
+        # {(name, labels): value} and {(name, labels): [count per bucket..., count, sum]}
+        self.counters = {}
+        self.histograms = {}
+
+    def _check_fork(self):
+        # a forked worker must not report (and write into the file of) its parent's metrics
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def record(self, route, method, status, duration, size, queries, query_duration):
+        with self._lock:
+            self._check_fork()
+            self._inc(('review_http_requests_total', (('route', route), ('method', method), ('status', status))))
+            labels = (('route', route), )
+            self._inc(('review_http_db_queries_total', labels), queries)
+            self._inc(('review_http_db_query_duration_seconds_total', labels), query_duration)
+            self._observe(('review_http_request_duration_seconds', labels), duration)
+            if size is not None:
+                self._observe(('review_http_response_size_bytes', labels), size)
+
+        if settings.METRICS_DIR and time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def _inc(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def _observe(self, key, value):
+        buckets = HISTOGRAMS[key[0]][1]
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[index] += 1
+        histogram[-2] += 1
+        histogram[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def flush(self):
+        """
+        Write the metrics of this process to its own file in ``METRICS_DIR``.
+        """
+        self.flushed_at = time.monotonic()
+        snapshot = self.snapshot()
+        if self.path is None:
+            self.path = os.path.join(settings.METRICS_DIR, f"metrics-{self.pid}-{int(time.time() * 1000)}.json")
+        # written to a separate file first so readers never see a half written snapshot
+        temporary_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(temporary_path, self.path)
+
+    def collect(self):
+        """
+        Return the snapshots of every process, the current one taken right now.
+        """
+        snapshots = [self.snapshot()]
+        if settings.METRICS_DIR:
+            own_file = os.path.basename(self.path) if self.path else None
+            for file_name in os.listdir(settings.METRICS_DIR):
+                if not file_name.endswith(".json") or file_name == own_file:
+                    continue
+                try:
+                    with open(os.path.join(settings.METRICS_DIR, file_name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    # removed or being replaced, the next scrape gets it
+                    continue
+        return snapshots
+
+    def render(self):
+        counters, histograms = {}, {}
+        for snapshot in self.collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    merged[index] += value
+
+        lines = []
+        for name, help_text in COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (key_name, labels), value in sorted(counters.items()):
+                if key_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (key_name, labels), values in sorted(histograms.items()):
+                if key_name != name:
+                    continue
+                for bound, value in zip(buckets, values):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)), ))} {value}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'), ))} {values[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {values[-2]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting the queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, the SQL queries and the response size of every request by route, where the route is the
+    name of the resolved view (``review.views.ReviewList``, ``admin:review_review_changelist`` etc.).
+    It should be the first middleware so the time spent in the others is included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match is not None else "unmatched"
+        size = None if response.streaming else len(response.content)
+        registry.record(route, request.method, response.status_code, duration, size, timer.queries, timer.duration)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 2.1.4 on 2026-10-18 19:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0002_auto_20181218_1749'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ('-created_at', '-id')},
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='company_name',
+            field=models.CharField(db_index=True, help_text='Name of the reviewed company.', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.SmallIntegerField(db_index=True, help_text='Rating of the review.', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='summary',
+            field=models.TextField(help_text='Summary of the review.', max_length=10000),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='title',
+            field=models.CharField(db_index=True, help_text='Title of the review, keep it short.', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer', 'created_at', 'id'], name='review_reviewer_created_idx'),
+        ),
+    ]
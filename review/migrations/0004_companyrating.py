@@ -0,0 +1,52 @@
+# Generated by Django 2.1.4 on 2026-10-18 20:03
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def aggregate_company_ratings(reviews):
+    # a copy of review.models.aggregate_company_ratings as of this migration
+    summaries = defaultdict(lambda: dict(review_count=0, rating_sum=0, **{f'rating_{r}': 0 for r in range(1, 6)}))
+    for row in reviews.order_by().values('company_name', 'rating').annotate(count=Count('id')):
+        summary = summaries[row['company_name']]
+        summary['review_count'] += row['count']
+        summary['rating_sum'] += row['rating'] * row['count']
+        summary[f"rating_{row['rating']}"] += row['count']
+    return summaries
+
+
+def build_company_ratings(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Review = apps.get_model('review', 'Review')
+    CompanyRating = apps.get_model('review', 'CompanyRating')
+    CompanyRating.objects.using(db).bulk_create(
+        CompanyRating(company_name=company_name, **summary)
+        for company_name, summary in aggregate_company_ratings(Review.objects.using(db)).items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0003_review_reviewer_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyRating',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_name', models.CharField(max_length=255, unique=True)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_company_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.1.4 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0005_review_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer', 'company_name', 'created_at', 'id'], name='review_reviewer_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer', 'rating', 'created_at', 'id'], name='review_reviewer_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.1.4 on 2026-10-18 20:30
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def log_existing_reviews(apps, schema_editor):
+    # the feed starts with the reviews which exist already
+    db = schema_editor.connection.alias
+    Review = apps.get_model('review', 'Review')
+    ReviewChange = apps.get_model('review', 'ReviewChange')
+    rows = Review.objects.using(db).order_by('id').values_list('id', 'reviewer_id').iterator(chunk_size=1000)
+    while True:
+        changes = [
+            ReviewChange(reviewer_id=reviewer_id, review_id=review_id, action='created')
+            for review_id, reviewer_id in islice(rows, 1000)
+        ]
+        if not changes:
+            break
+        ReviewChange.objects.using(db).bulk_create(changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('review', '0007_review_ingest_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_id', models.IntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('deleted', 'Deleted')], max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='review_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reviewchange',
+            index=models.Index(fields=['reviewer', 'id'], name='review_change_reviewer_idx'),
+        ),
+        migrations.RunPython(log_existing_reviews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.1.4 on 2026-10-18 20:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('review', '0008_reviewchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('company_name', models.CharField(max_length=255)),
+                ('rating', models.SmallIntegerField()),
+                ('title', models.CharField(max_length=64)),
+                ('summary', models.TextField(max_length=10000)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('ingest_id', models.UUIDField(blank=True, null=True)),
+                ('reviewer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_reviews', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created_at', '-id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['reviewer', 'created_at', 'id'], name='review_archived_created_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.1.4 on 2026-10-19 09:30
+
+from django.db import migrations, models
+from django.db.models import F
+
+FTS_TABLE = 'review_review_fts'
+COLUMNS = 'title, summary, company_name'
+NEW = 'new.title, new.summary, new.company_name'
+OLD = 'old.title, old.summary, old.company_name'
+
+# a copy of review.search.create_search_index as of this migration
+CREATE_SEARCH_INDEX = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{COLUMNS}, content='review_review', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON review_review BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.id, {NEW}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON review_review BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON review_review BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.id, {NEW}); END",
+]
+
+
+def copy_created_at(apps, schema_editor):
+    Review = apps.get_model('review', 'Review')
+    Review.objects.using(schema_editor.connection.alias).update(updated_at=F('created_at'))
+
+
+def restore_search_triggers(apps, schema_editor):
+    # adding the field rebuilds review_review on SQLite, which drops the triggers of the search index
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            for statement in CREATE_SEARCH_INDEX:
+                cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0009_archivedreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+            preserve_default=False,
+        ),
+        # before the triggers are back, they would index every review again
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer', 'updated_at'], name='review_reviewer_updated_idx'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
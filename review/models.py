@@ -1,10 +1,39 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, connections, router, transaction
 from django.db.models import (
-    Model, SmallIntegerField, CharField, TextField, GenericIPAddressField, DateTimeField, ForeignKey, CASCADE
+    Model, Manager, SmallIntegerField, CharField, TextField, GenericIPAddressField, DateTimeField, ForeignKey, CASCADE,
+    DO_NOTHING, Index, PositiveIntegerField, UUIDField, F, Count, IntegerField
 )
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class ReviewManager(Manager):
+    def bulk_create_and_record(self, reviews):
+        """
+        Create the reviews with one ``bulk_create`` and do what the signals do for a single review (see
+        ``review.signals``), ``bulk_create`` sends no ``post_save``.
+        """
+        db = router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            self.db_manager(db).bulk_create(reviews)
+            self._set_created_ids(reviews, db)
+            CompanyRating.objects.record(reviews)
+            ReviewChange.objects.record(reviews, ReviewChange.CREATED)
+        return reviews
+
+    def _set_created_ids(self, reviews, db):
+        # SQLite doesn't return the ids of the created rows, they are the last ids of the table: the transaction
+        # holds the write lock since the inserts
+        missing = [review for review in reviews if review.pk is None]
+        if not missing:
+            return
+        ids = self.db_manager(db).order_by("-id").values_list("id", flat=True)[:len(missing)]
+        for review, pk in zip(missing, reversed(ids)):
+            review.pk = pk
+
+
 class Review(Model):
     reviewer = ForeignKey(User, related_name="reviews", on_delete=CASCADE)
     company_name = CharField(max_length=255, db_index=True, help_text="Name of the reviewed company.")
@@ -14,9 +43,202 @@ class Review(Model):
     summary = TextField(max_length=10000, help_text="Summary of the review.")
     ip_address = GenericIPAddressField(blank=True, null=True)
     created_at = DateTimeField(auto_now_add=True, db_index=True)
+    # reviews can be edited in the admin, the ETags follow it, see review.etags
+    updated_at = DateTimeField(auto_now=True)
+    # tracking id of reviews created through the ingest queue, see review.ingest
+    ingest_id = UUIDField(blank=True, null=True, unique=True, editable=False)
+
+    objects = ReviewManager()
 
     class Meta:
-        ordering = ("-created_at", )
+        ordering = ("-created_at", "-id")
+        indexes = [
+            # keyset pagination of ReviewList, see ReviewCursorPagination
+            Index(fields=["reviewer", "created_at", "id"], name="review_reviewer_created_idx"),
+            # filtered pages of ReviewList, see ReviewFilterBackend
+            Index(fields=["reviewer", "company_name", "created_at", "id"], name="review_reviewer_company_idx"),
+            Index(fields=["reviewer", "rating", "created_at", "id"], name="review_reviewer_rating_idx"),
+            # ETag of ReviewList, see review.etags
+            Index(fields=["reviewer", "updated_at"], name="review_reviewer_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.rating} - {self.title} - {self.company_name} - {self.reviewer.username}"
+
+
+def aggregate_company_ratings(*querysets):
+    """
+    Compute the ``CompanyRating`` field values of every company from scratch out of ``Review`` (or
+    ``ArchivedReview``) querysets.
+    """
+    summaries = defaultdict(lambda: dict(review_count=0, rating_sum=0, **{f'rating_{r}': 0 for r in range(1, 6)}))
+    for reviews in querysets:
+        for row in reviews.order_by().values("company_name", "rating").annotate(count=Count("id")):
+            summary = summaries[row['company_name']]
+            summary['review_count'] += row['count']
+            summary['rating_sum'] += row['rating'] * row['count']
+            summary[f"rating_{row['rating']}"] += row['count']
+    return summaries
+
+
+class CompanyRatingManager(Manager):
+    def record(self, reviews, sign=1):
+        """
+        Add (or with ``sign=-1`` remove) the ratings of the given reviews to the summaries of their companies.
+        """
+        ratings = defaultdict(Counter)
+        for review in reviews:
+            ratings[review.company_name][review.rating] += sign
+
+        with transaction.atomic(using=self.db):
+            for company_name, counter in ratings.items():
+                deltas = {
+                    'review_count': sum(counter.values()),
+                    'rating_sum': sum(rating * count for rating, count in counter.items()),
+                }
+                for rating, count in counter.items():
+                    deltas[f'rating_{rating}'] = count
+                changes = {field: F(field) + delta for field, delta in deltas.items()}
+
+                if self.filter(company_name=company_name).update(**changes) or sign < 0:
+                    continue
+
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(company_name=company_name, **deltas)
+                except IntegrityError:
+                    # created by a concurrent request since the update above
+                    self.filter(company_name=company_name).update(**changes)
+
+
+class CompanyRating(Model):
+    """
+    Rating summary of a company, kept up to date by ``CompanyRating.objects.record`` whenever reviews are
+    created, edited or deleted so reading it never has to aggregate the reviews.
+    """
+
+    company_name = CharField(max_length=255, unique=True)
+    review_count = PositiveIntegerField(default=0)
+    rating_sum = PositiveIntegerField(default=0)
+    rating_1 = PositiveIntegerField(default=0)
+    rating_2 = PositiveIntegerField(default=0)
+    rating_3 = PositiveIntegerField(default=0)
+    rating_4 = PositiveIntegerField(default=0)
+    rating_5 = PositiveIntegerField(default=0)
+
+    objects = CompanyRatingManager()
+
+    RATINGS = range(1, 6)
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    @property
+    def histogram(self):
+        return {str(rating): getattr(self, f"rating_{rating}") for rating in self.RATINGS}
+
+    def __str__(self):
+        return f"{self.company_name} - {self.review_count}"
+
+
+class ReviewChangeManager(Manager):
+    def record(self, reviews, action):
+        """
+        Append a change of the given action to the log for every review, they need to have their ids.
+        """
+        self.bulk_create(
+            ReviewChange(reviewer_id=review.reviewer_id, review_id=review.pk, action=action) for review in reviews
+        )
+
+
+class ReviewChange(Model):
+    """
+    Append-only log of the created and deleted reviews, the id is the cursor of the change feed. Written by
+    ``ReviewChange.objects.record`` whenever reviews are created or deleted.
+    """
+
+    CREATED = "created"
+    DELETED = "deleted"
+    ACTIONS = ((CREATED, "Created"), (DELETED, "Deleted"))
+
+    # without a constraint, the deletions of the reviews of a deleted user are logged while the user is deleted
+    reviewer = ForeignKey(User, related_name="review_changes", on_delete=CASCADE, db_constraint=False)
+    # not a foreign key, the deleted reviews are logged too
+    review_id = IntegerField()
+    action = CharField(max_length=16, choices=ACTIONS)
+    created_at = DateTimeField(auto_now_add=True)
+
+    objects = ReviewChangeManager()
+
+    class Meta:
+        ordering = ("id", )
+        indexes = [
+            # the change feed reads the changes of a reviewer after a cursor
+            Index(fields=["reviewer", "id"], name="review_change_reviewer_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.action} - {self.review_id}"
+
+
+class ArchivedReviewManager(Manager):
+    def archive(self, before, chunk_size):
+        """
+        Move the reviews created before ``before`` from ``Review`` to the archive, ``chunk_size`` of them per
+        transaction, and yield the number of moved reviews after every chunk.
+        """
+        fields = [field.attname for field in ArchivedReview._meta.concrete_fields]
+        hot_db, archive_db = router.db_for_write(Review), router.db_for_write(ArchivedReview)
+        reviews = Review.objects.filter(created_at__lt=before).order_by("created_at", "id")
+        delete_sql = f"DELETE FROM {connections[hot_db].ops.quote_name(Review._meta.db_table)} WHERE id IN ({{}})"
+
+        while True:
+            with transaction.atomic(using=hot_db), transaction.atomic(using=archive_db):
+                rows = list(reviews.values(*fields)[:chunk_size])
+                if not rows:
+                    return
+                ids = [row['id'] for row in rows]
+                # copied by an earlier run which stopped before deleting them, with a separate archive database
+                existing = set(self.filter(id__in=ids).values_list("id", flat=True))
+                self.bulk_create(ArchivedReview(**row) for row in rows if row['id'] not in existing)
+                # a plain DELETE instead of QuerySet.delete(), which sends post_delete for every review: the reviews
+                # are moved, not deleted, so the company ratings, the change feed and the cached representations
+                # have to stay as they are (and collecting the reviews for the signals would be slow too)
+                with connections[hot_db].cursor() as cursor:
+                    cursor.execute(delete_sql.format(", ".join(["%s"] * len(ids))), ids)
+            yield len(rows)
+
+
+class ArchivedReview(Model):
+    """
+    Review moved out of ``Review`` by the ``archive_reviews`` command, so the table of the recent reviews (which
+    are read the most) and its indexes stay small. It keeps the id of the review and lives in the
+    ``REVIEW_ARCHIVE_DATABASE``, see ``review.routers``.
+    """
+
+    id = IntegerField(primary_key=True)
+    # the users are not in a separate archive database, the reviews of a deleted user are deleted by
+    # review.signals instead of the cascade
+    reviewer = ForeignKey(User, related_name="archived_reviews", on_delete=DO_NOTHING, db_constraint=False)
+    company_name = CharField(max_length=255)
+    rating = SmallIntegerField()
+    title = CharField(max_length=64)
+    summary = TextField(max_length=10000)
+    ip_address = GenericIPAddressField(blank=True, null=True)
+    created_at = DateTimeField()
+    ingest_id = UUIDField(blank=True, null=True)
+
+    objects = ArchivedReviewManager()
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        indexes = [
+            # pagination of ReviewList, the archive is rarely read so the other filters scan the reviewer's rows
+            Index(fields=["reviewer", "created_at", "id"], name="review_archived_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.rating} - {self.title} - {self.company_name} - {self.reviewer_id}"
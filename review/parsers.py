@@ -0,0 +1,19 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from review.compat import msgpack
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies, see ``MessagePackRenderer``.
+    """
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        assert msgpack is not None, "msgpack must be installed to use MessagePackParser"
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise ParseError(f"MessagePack parse error - {e}")
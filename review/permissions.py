@@ -3,4 +3,5 @@ from rest_framework.permissions import BasePermission
 
 class IsReviewer(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.reviewer == request.user
+        # the id, comparing the users would load the reviewer
+        return obj.reviewer_id == request.user.pk
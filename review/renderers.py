@@ -0,0 +1,76 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from review.compat import msgpack
+
+
+class _Echo:
+    """
+    File-like object for ``csv.writer`` which hands back the written line instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders one JSON document per line, ``render_rows`` can be used to stream the lines one by one.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render_rows(self, rows, fields=None):
+        encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        for row in rows:
+            yield (encoder.encode(row) + "\n").encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return b"".join(self.render_rows(data if isinstance(data, list) else [data]))
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a header and one line per row, ``render_rows`` can be used to stream the lines one by one.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render_rows(self, rows, fields):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields).encode()
+        for row in rows:
+            yield writer.writerow([row.get(field) for field in fields]).encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return b"".join(self.render_rows(rows, fields))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack, a binary equivalent of JSON. Values MessagePack has no type for (like UUIDs or dates) are
+    converted the same way as in JSON.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack is not None, "msgpack must be installed to use MessagePackRenderer"
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
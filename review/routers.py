@@ -0,0 +1,130 @@
+"""
+Routing of reads to the read replicas of the database.
+
+Writes always go to ``default``, the primary. Reads go there too, except inside the views decorated with
+``replica_reads`` (the review list and detail), which read from a randomly picked alias of ``DATABASE_REPLICAS``.
+Replicas lag behind the primary, so a user who has just written something (any successful unsafe request, see
+``PrimaryPinningMiddleware``) keeps reading from the primary for ``REVIEW_READ_YOUR_WRITES_WINDOW`` seconds and
+sees their own writes. The pins live in the ``REVIEW_CACHE_ALIAS`` cache, which has to be shared by the worker
+processes for them to work across workers.
+
+The archived reviews are read from and written to ``REVIEW_ARCHIVE_DATABASE``, and the entries of the
+``DatabaseCache`` to ``REVIEW_CACHE_DATABASE``, which only have their tables when they are separate databases.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_local = threading.local()
+
+
+def _key(user_id):
+    return f"review:primary:{user_id}"
+
+
+def pin_to_primary(user):
+    if settings.REVIEW_READ_YOUR_WRITES_WINDOW:
+        caches[settings.REVIEW_CACHE_ALIAS].set(_key(user.pk), True, settings.REVIEW_READ_YOUR_WRITES_WINDOW)
+
+
+def is_pinned_to_primary(user):
+    return bool(settings.REVIEW_READ_YOUR_WRITES_WINDOW) and \
+        caches[settings.REVIEW_CACHE_ALIAS].get(_key(user.pk), False)
+
+
+@contextmanager
+def use_replica(user):
+    """
+    Route the reads of this thread to a replica, unless there is none or ``user`` has to read their writes.
+    """
+    previous = getattr(_local, "alias", None)
+    if settings.DATABASE_REPLICAS and not (user.is_authenticated and is_pinned_to_primary(user)):
+        _local.alias = random.choice(settings.DATABASE_REPLICAS)
+    try:
+        yield
+    finally:
+        _local.alias = previous
+
+
+def replica_reads(view_func):
+    """
+    View decorator reading from a replica, meant for read only views.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with use_replica(request.user):
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+ARCHIVE_MODEL = "archivedreview"
+
+
+# app label of the model of the cache table of django.core.cache.backends.db.DatabaseCache
+CACHE_APP_LABEL = "django_cache"
+
+
+def _is_archive(model):
+    return model._meta.app_label == "review" and model._meta.model_name == ARCHIVE_MODEL
+
+
+def _is_cache(model):
+    return model._meta.app_label == CACHE_APP_LABEL
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _is_archive(model):
+            return settings.REVIEW_ARCHIVE_DATABASE
+        if _is_cache(model):
+            return settings.REVIEW_CACHE_DATABASE
+        return getattr(_local, "alias", None)
+
+    def db_for_write(self, model, **hints):
+        if _is_archive(model):
+            return settings.REVIEW_ARCHIVE_DATABASE
+        if _is_cache(model):
+            return settings.REVIEW_CACHE_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        separate = (
+            (settings.REVIEW_ARCHIVE_DATABASE, app_label == "review" and model_name == ARCHIVE_MODEL),
+            (settings.REVIEW_CACHE_DATABASE, app_label == CACHE_APP_LABEL),
+        )
+        for alias, belongs in separate:
+            if alias == DEFAULT_DB_ALIAS:
+                continue
+            # nothing else goes to a separate database, not even the data migrations (without a model name)
+            if db == alias:
+                return belongs
+            if belongs:
+                return False
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas have the same data as the primary
+        return True
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pins the user of every successful unsafe request to the primary, see ``review.routers``. It has to come after
+    ``AuthenticationMiddleware``, the user authenticated by the views (by token) is seen on the way back.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, "user", None)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and user and user.is_authenticated:
+            pin_to_primary(user)
+        return response
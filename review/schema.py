@@ -0,0 +1,154 @@
+"""
+Precomputed schema of the API documentation.
+
+Generating the coreapi schema inspects every view, serializer and filter, so instead of doing it on every request of
+the documentation the ``build_schema`` command does it once, at build time, and writes it to ``REVIEW_SCHEMA_PATH``
+as CoreJSON, together with a hash of the sources it's made of. The documentation views load that file once per
+process and serve it from memory. When the hash doesn't match (the URLconf, the serializers or the REST_FRAMEWORK
+settings changed without running the command) or there is no file, the first request generates the schema and writes
+it instead.
+
+The responses are cached by the clients for ``REVIEW_SCHEMA_MAX_AGE`` seconds and have an ``ETag`` made of the
+hash of the schema, after a change the clients get the new one once their copy expired.
+"""
+import hashlib
+import importlib
+import json
+import logging
+import os
+import threading
+
+import coreapi
+import django
+import rest_framework
+from coreapi.codecs import CoreJSONCodec
+from coreapi.exceptions import ParseError
+from django.conf import settings
+from django.conf.urls import include, url
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from rest_framework.documentation import get_docs_view, get_schemajs_view
+from rest_framework.schemas import SchemaGenerator
+
+logger = logging.getLogger(__name__)
+
+TITLE = "Review API"
+# the schema is generated out of these modules and settings, a change in any of them may change it
+SOURCE_MODULES = (
+    "review.urls", "review.views", "review.serializers", "review.filters", "review.pagination", "review.models",
+)
+SOURCE_SETTINGS = ("REST_FRAMEWORK", )
+
+
+def source_hash():
+    digest = hashlib.sha1(f"{django.__version__}|{rest_framework.__version__}".encode())
+    # like the renderer and parser classes (which depend on the installed packages) or the page size
+    source_settings = {name: getattr(settings, name) for name in SOURCE_SETTINGS}
+    digest.update(json.dumps(source_settings, sort_keys=True, default=str).encode())
+    for name in SOURCE_MODULES:
+        with open(importlib.import_module(name).__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def generate_schema():
+    return SchemaGenerator(title=TITLE).get_schema(request=None, public=True)
+
+
+def write_schema(path, document, sources):
+    # written next to the old one and renamed, the running processes never read half of it
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump({'sources': sources, 'schema': json.loads(CoreJSONCodec().encode(document))}, f)
+    os.replace(temporary, path)
+
+
+def read_schema(path, sources):
+    """
+    Return the schema stored in the file, or None if there is none or it was made out of other sources.
+    """
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+        if stored['sources'] != sources:
+            return None
+        return CoreJSONCodec().decode(json.dumps(stored['schema']).encode())
+    except (OSError, ValueError, KeyError, TypeError, ParseError):
+        return None
+
+
+class SchemaCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.document, self.digest = None, None
+
+    def get(self):
+        """
+        Return the schema and its hash, loaded (or generated) on the first call.
+        """
+        with self.lock:
+            if self.document is None:
+                self.document = self.load(settings.REVIEW_SCHEMA_PATH)
+                self.digest = hashlib.sha1(CoreJSONCodec().encode(self.document)).hexdigest()
+            return self.document, self.digest
+
+    @staticmethod
+    def load(path):
+        sources = source_hash()
+        document = read_schema(path, sources)
+        if document is None:
+            logger.info("The schema at %s is missing or out of date, generating it.", path)
+            document = generate_schema()
+            try:
+                write_schema(path, document, sources)
+            except OSError:
+                logger.warning("Could not write the schema to %s.", path, exc_info=True)
+            # served the same as the ones read from the file, CoreJSON leaves out some details (like the textarea
+            # format of the fields)
+            document = CoreJSONCodec().decode(CoreJSONCodec().encode(document))
+        return document
+
+
+schema_cache = SchemaCache()
+
+
+class PrecomputedSchemaGenerator(SchemaGenerator):
+    def get_schema(self, request=None, public=False):
+        document, _ = schema_cache.get()
+        # the same as a generated one, which has the URL of the request
+        return coreapi.Document(
+            url=self.url or (request.build_absolute_uri() if request is not None else None),
+            title=document.title, description=document.description, content=dict(document.items()),
+        )
+
+
+def schema_etag(request, *args, **kwargs):
+    _, digest = schema_cache.get()
+    # the docs show whether the user is authenticated and the schema has the URL of the request
+    parts = (digest, request.get_host(), request.get_full_path(), request.META.get("HTTP_ACCEPT"),
+             request.META.get("HTTP_AUTHORIZATION"))
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def cached_schema_view(view):
+    # the headers are added to the 304 responses too
+    view = condition(etag_func=schema_etag)(view)
+    view = cache_control(private=True, max_age=settings.REVIEW_SCHEMA_MAX_AGE)(view)
+    return vary_on_headers("Accept", "Authorization")(view)
+
+
+def docs_urls():
+    """
+    ``include_docs_urls`` serving the precomputed schema with caching headers.
+    """
+    docs_view = get_docs_view(title=TITLE, generator_class=PrecomputedSchemaGenerator)
+    schema_js_view = get_schemajs_view(title=TITLE, generator_class=PrecomputedSchemaGenerator)
+    urls = [
+        url(r'^$', cached_schema_view(docs_view), name='docs-index'),
+        url(r'^schema.js$', cached_schema_view(schema_js_view), name='schema-js'),
+    ]
+    return include((urls, 'api-docs'), namespace='api-docs')
@@ -0,0 +1,96 @@
+"""
+Full-text search of reviews backed by an SQLite FTS5 index.
+
+``review_review_fts`` is an external content table over ``review_review``, it only stores the index and is
+kept in sync by triggers. SQLite drops the triggers together with the table, so a migration that makes Django
+rebuild ``review_review`` has to call ``create_search_index`` again (or run the ``rebuild_search_index`` command).
+"""
+from review.models import Review
+
+FTS_TABLE = "review_review_fts"
+FTS_COLUMNS = ("title", "summary", "company_name")
+# bm25 weights of the columns above, a match in the title counts more than one in the long summary
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+
+def _column_list(prefix=""):
+    return ", ".join(f"{prefix}{column}" for column in FTS_COLUMNS)
+
+
+def create_search_index(connection):
+    columns, new, old = _column_list(), _column_list("new."), _column_list("old.")
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='review_review', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON review_review BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON review_review BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON review_review BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new}); END",
+    ]
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        for suffix in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def rebuild_search_index(connection):
+    create_search_index(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_expression(query, columns=None, prefix=False):
+    """
+    Turn free text into an FTS5 query matching rows that contain every term, any FTS5 syntax in the text is
+    treated as literal so user input can't make the MATCH fail. ``columns`` limits the match to those columns,
+    with ``prefix`` the terms match the beginning of words too.
+    """
+    terms = query.split()
+    expression = " ".join('"{}"{}'.format(term.replace('"', '""'), "*" if prefix else "") for term in terms)
+    if expression and columns:
+        expression = "{%s} : (%s)" % (" ".join(columns), expression)
+    return expression
+
+
+def filter_reviews(queryset, query, columns=None, prefix=False):
+    """
+    Filter a ``Review`` queryset to the rows matching ``query``, see ``build_match_expression``.
+    """
+    match = build_match_expression(query, columns, prefix)
+    if not match:
+        return queryset
+    # not id__in=RawSQL(...), Django would wrap it into a second pair of parentheses which makes it a scalar
+    # subquery for SQLite, matching the first row only
+    return queryset.extra(
+        where=[f"review_review.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)"], params=[match]
+    )
+
+
+def search_reviews(reviewer, query, limit):
+    """
+    Return the reviews of ``reviewer`` matching ``query``, best match first.
+    """
+    match = build_match_expression(query)
+    if not match:
+        return []
+
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    reviews = list(Review.objects.raw(
+        f"SELECT review_review.* FROM {FTS_TABLE} "
+        f"JOIN review_review ON review_review.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND review_review.reviewer_id = %s "
+        f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+        [match, reviewer.pk, limit],
+    ))
+    for review in reviews:
+        review.reviewer = reviewer
+    return reviews
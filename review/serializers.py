@@ -1,11 +1,109 @@
-from rest_framework.serializers import ModelSerializer, ReadOnlyField
+from collections import OrderedDict
 
-from review.models import Review
+from django.utils.functional import cached_property
+from rest_framework.serializers import ModelSerializer, ReadOnlyField, DictField, IntegerField, CharField
+
+from review.models import CompanyRating, Review, ReviewChange
 
 
 class ReviewSerializer(ModelSerializer):
+    """
+    ``fields`` limits the representation to the given fields.
+    """
+
     reviewer = ReadOnlyField(source="reviewer.username")
 
     class Meta:
         model = Review
         fields = ("id", "rating", "title", "summary", "created_at", "company_name", "reviewer", )
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ValuesSerializer:
+    """
+    Builds the same representation as ``serializer_class`` out of ``values_list()`` rows.
+
+    The field lookups and conversions are worked out once, so serializing a row is a single pass over a tuple
+    instead of going through the attribute lookup and ``to_representation`` of every field of the serializer.
+    It only supports serializers whose fields read a (possibly related) model field directly. With ``fields`` only
+    those fields are serialized and only their columns are read from the database.
+    """
+
+    # fields whose representation is the value coming from the database
+    identity_fields = (CharField, IntegerField, ReadOnlyField)
+
+    def __init__(self, serializer_class, fields=None):
+        self.serializer_class = serializer_class
+        self.fields = fields
+        self._subsets = {}
+
+    def only(self, fields):
+        """
+        Return the serializer of the given fields, they are kept in the order of ``serializer_class``.
+        """
+        key = frozenset(fields)
+        if key not in self._subsets:
+            self._subsets[key] = ValuesSerializer(self.serializer_class, key)
+        return self._subsets[key]
+
+    @cached_property
+    def _fields(self):
+        return [
+            field for field in self.serializer_class().fields.values()
+            if self.fields is None or field.field_name in self.fields
+        ]
+
+    @cached_property
+    def names(self):
+        return [field.field_name for field in self._fields]
+
+    @cached_property
+    def lookups(self):
+        return ["__".join(field.source_attrs) for field in self._fields]
+
+    @cached_property
+    def converters(self):
+        return [
+            (index, field.to_representation) for index, field in enumerate(self._fields)
+            if type(field) not in self.identity_fields
+        ]
+
+    def to_representation(self, row):
+        if self.converters:
+            row = list(row)
+            for index, convert in self.converters:
+                if row[index] is not None:
+                    row[index] = convert(row[index])
+        return OrderedDict(zip(self.names, row))
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.lookups)
+
+    def serialize(self, queryset):
+        return [self.to_representation(row) for row in self.rows(queryset)]
+
+
+review_values_serializer = ValuesSerializer(ReviewSerializer)
+
+
+class CompanyRatingSerializer(ModelSerializer):
+    average_rating = ReadOnlyField()
+    histogram = DictField(child=IntegerField(), read_only=True)
+
+    class Meta:
+        model = CompanyRating
+        fields = ("company_name", "review_count", "average_rating", "histogram", )
+
+
+class ReviewChangeSerializer(ModelSerializer):
+    cursor = IntegerField(source="id", read_only=True)
+    review = IntegerField(source="review_id", read_only=True)
+
+    class Meta:
+        model = ReviewChange
+        fields = ("cursor", "action", "review", "created_at", )
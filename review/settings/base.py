@@ -1,6 +1,7 @@
 """
 Base settings to build other settings files upon.
 """
+from importlib.util import find_spec
 
 import environ
 
@@ -45,6 +46,35 @@ DATABASES = {
         'NAME': str(ROOT_DIR.path("review.db")),
     }
 }
+# Pragmas applied to every new SQLite connection by the review.backends.sqlite3 backend (used by the production
+# settings): WAL lets the readers go on while a write is in progress, NORMAL synchronous is durable with WAL
+# except for the last transactions on a power loss, busy_timeout (ms) is how long to wait for a lock,
+# mmap_size (bytes) and cache_size (negative is KiB) are per connection
+SQLITE_PRAGMAS = {
+    'journal_mode': env('DJANGO_SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': env('DJANGO_SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': env.int('DJANGO_SQLITE_BUSY_TIMEOUT', default=5000),
+    'mmap_size': env.int('DJANGO_SQLITE_MMAP_SIZE', default=256 * 1024 * 1024),
+    'cache_size': env.int('DJANGO_SQLITE_CACHE_SIZE', default=-64 * 1024),
+}
+# Read replicas of the default database as database URLs (e.g. sqlite:////var/lib/review/replica.db), they are
+# added to DATABASES as replica0, replica1... and used by the views reading from a replica, see review.routers
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list('DJANGO_DATABASE_REPLICA_URLS', default=[])):
+    DATABASES[f'replica{index}'] = env.db_url_config(url)
+    DATABASE_REPLICAS.append(f'replica{index}')
+# Separate database of the archived reviews as a database URL (e.g. sqlite:////var/lib/review/archive.db), which
+# keeps them out of the backups and the VACUUM of the default database. It's added to DATABASES as archive and
+# has to be migrated with ./manage.py migrate --database archive, without it the archive is a table of the
+# default database, see review.models.ArchivedReview
+REVIEW_ARCHIVE_DATABASE = 'default'
+if env('DJANGO_REVIEW_ARCHIVE_DATABASE_URL', default=None):
+    DATABASES['archive'] = env.db_url_config(env('DJANGO_REVIEW_ARCHIVE_DATABASE_URL'))
+    REVIEW_ARCHIVE_DATABASE = 'archive'
+# Database of the table of the DatabaseCache (django.core.cache.backends.db) when it's used, see review.routers
+REVIEW_CACHE_DATABASE = 'default'
+# https://docs.djangoproject.com/en/dev/ref/settings/#database-routers
+DATABASE_ROUTERS = ['review.routers.ReplicaRouter']
 
 # URLS
 # ------------------------------------------------------------------------------
@@ -52,6 +82,9 @@ DATABASES = {
 ROOT_URLCONF = 'review.urls'
 # https://docs.djangoproject.com/en/dev/ref/settings/#wsgi-application
 WSGI_APPLICATION = 'review.wsgi.application'
+# Number of threads running the requests of an ASGI worker process (each of them may keep a database connection
+# open), see review.asgi
+ASGI_THREADS = env.int('DJANGO_ASGI_THREADS', default=16)
 
 # APPS
 # ------------------------------------------------------------------------------
@@ -71,7 +104,7 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
-    'review',
+    'review.apps.ReviewConfig',
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -91,6 +124,12 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Size and TTL (seconds) of the per process token cache of review.authentication.CachedTokenAuthentication
+TOKEN_AUTH_CACHE_SIZE = env.int('DJANGO_TOKEN_AUTH_CACHE_SIZE', default=10000)
+TOKEN_AUTH_CACHE_TTL = env.int('DJANGO_TOKEN_AUTH_CACHE_TTL', default=60)
+# Optional CACHES alias shared between processes, consulted after the per process cache
+TOKEN_AUTH_CACHE_ALIAS = env('DJANGO_TOKEN_AUTH_CACHE_ALIAS', default=None)
+
 # https://docs.djangoproject.com/en/dev/ref/settings/#login-redirect-url
 LOGIN_REDIRECT_URL = 'users:redirect'
 # https://docs.djangoproject.com/en/dev/ref/settings/#login-url
@@ -114,15 +153,32 @@ AUTH_PASSWORD_VALIDATORS = []
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    'review.metrics.MetricsMiddleware',
+    'review.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'review.routers.PrimaryPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# METRICS
+# ------------------------------------------------------------------------------
+# Directory shared by the worker processes for their metrics, required with more than one worker
+METRICS_DIR = env('DJANGO_METRICS_DIR', default=None)
+# Seconds between two writes of the metrics of a process into METRICS_DIR
+METRICS_FLUSH_INTERVAL = env.int('DJANGO_METRICS_FLUSH_INTERVAL', default=5)
+# Addresses allowed to read the metrics endpoint
+METRICS_ALLOWED_IPS = env.list('DJANGO_METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
+# COMPRESSION
+# ------------------------------------------------------------------------------
+# Responses of at least this many bytes are compressed with brotli or gzip, see review.compression
+COMPRESSION_MIN_SIZE = env.int('DJANGO_COMPRESSION_MIN_SIZE', default=1024)
+
 # STATIC
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#static-root
@@ -213,15 +269,63 @@ ADMINS = [
 MANAGERS = ADMINS
 
 
+# REVIEW
+# ------------------------------------------------------------------------------
+# Maximum number of reviews accepted by one request of the bulk create endpoint
+REVIEW_BULK_CREATE_LIMIT = env.int('DJANGO_REVIEW_BULK_CREATE_LIMIT', default=1000)
+# Maximum number of ids accepted by one request of the batch retrieve endpoint
+REVIEW_BATCH_RETRIEVE_LIMIT = env.int('DJANGO_REVIEW_BATCH_RETRIEVE_LIMIT', default=100)
+# Response status of a request for someone else's review, 403 or 404 (which hides that the review exists)
+REVIEW_DETAIL_FORBIDDEN_STATUS = env.int('DJANGO_REVIEW_DETAIL_FORBIDDEN_STATUS', default=403)
+# CACHES alias and timeout (seconds) of the serialized reviews, see review.cache
+REVIEW_CACHE_ALIAS = env('DJANGO_REVIEW_CACHE_ALIAS', default='default')
+REVIEW_CACHE_TIMEOUT = env.int('DJANGO_REVIEW_CACHE_TIMEOUT', default=24 * 60 * 60)
+# Seconds the counts and the date hierarchy of the review admin are cached for, see review.admin
+REVIEW_ADMIN_CACHE_TIMEOUT = env.int('DJANGO_REVIEW_ADMIN_CACHE_TIMEOUT', default=5 * 60)
+# Seconds the responses of the requests with an Idempotency-Key are kept for their retries, see review.idempotency
+REVIEW_IDEMPOTENCY_TIMEOUT = env.int('DJANGO_REVIEW_IDEMPOTENCY_TIMEOUT', default=24 * 60 * 60)
+# CACHES alias of those responses, it has to keep them for the whole timeout
+REVIEW_IDEMPOTENCY_CACHE_ALIAS = env('DJANGO_REVIEW_IDEMPOTENCY_CACHE_ALIAS', default=REVIEW_CACHE_ALIAS)
+# File of the API schema written by the build_schema command, and the seconds the clients cache the
+# documentation for, see review.schema
+REVIEW_SCHEMA_PATH = env('DJANGO_REVIEW_SCHEMA_PATH', default=str(ROOT_DIR.path("schema.json")))
+REVIEW_SCHEMA_MAX_AGE = env.int('DJANGO_REVIEW_SCHEMA_MAX_AGE', default=24 * 60 * 60)
+# Seconds a user keeps reading from the primary database after a write, see review.routers
+REVIEW_READ_YOUR_WRITES_WINDOW = env.int('DJANGO_REVIEW_READ_YOUR_WRITES_WINDOW', default=5)
+# Maximum number of seconds a request of the change feed waits for new changes, see ReviewChanges
+REVIEW_CHANGES_MAX_WAIT = env.int('DJANGO_REVIEW_CHANGES_MAX_WAIT', default=30)
+# Seconds between two checks for new changes of a waiting request of the change feed
+REVIEW_CHANGES_POLL_INTERVAL = env.float('DJANGO_REVIEW_CHANGES_POLL_INTERVAL', default=0.5)
+# Reviews older than this many days are moved to the archive by the archive_reviews command
+REVIEW_ARCHIVE_AFTER_DAYS = env.int('DJANGO_REVIEW_ARCHIVE_AFTER_DAYS', default=365)
+# Number of rows fetched from the database at once by the export endpoint
+REVIEW_EXPORT_CHUNK_SIZE = env.int('DJANGO_REVIEW_EXPORT_CHUNK_SIZE', default=2000)
+# Queue the created reviews and insert them in batches in the background, see review.ingest
+REVIEW_INGEST_QUEUE = env.bool('DJANGO_REVIEW_INGEST_QUEUE', default=False)
+# SQLite database of the queued reviews, it has to be on a local disk shared by all the worker processes
+REVIEW_INGEST_SPOOL = env('DJANGO_REVIEW_INGEST_SPOOL', default=str(ROOT_DIR.path("ingest.db")))
+# Number of queued reviews inserted at once
+REVIEW_INGEST_BATCH_SIZE = env.int('DJANGO_REVIEW_INGEST_BATCH_SIZE', default=500)
+# Seconds between the flushes of the queue, with 0 no background flusher is started and the
+# flush_review_queue command has to be run instead
+REVIEW_INGEST_FLUSH_INTERVAL = env.float('DJANGO_REVIEW_INGEST_FLUSH_INTERVAL', default=1.0)
+
+
 # REST FRAMEWORK
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'review.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
-    )
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'review.pagination.ReviewCursorPagination',
+    'PAGE_SIZE': env.int('DJANGO_API_PAGE_SIZE', default=100),
 }
+# MessagePack is optional, clients get it with "Accept: application/msgpack" when installed
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('review.renderers.MessagePackRenderer', )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] += ('review.parsers.MessagePackParser', )
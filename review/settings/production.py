@@ -1,4 +1,51 @@
 from .base import *  # noqa
 from .base import env
 
-# TOOD no production for this test
+# GENERAL
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#secret-key
+SECRET_KEY = env('DJANGO_SECRET_KEY')
+# https://docs.djangoproject.com/en/dev/ref/settings/#allowed-hosts
+ALLOWED_HOSTS = env.list('DJANGO_ALLOWED_HOSTS', default=['localhost'])
+
+# DATABASES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#conn-max-age
+CONN_MAX_AGE = env.int('DJANGO_CONN_MAX_AGE', default=60)
+# Start the transactions with BEGIN IMMEDIATE, see review.backends.sqlite3. Every atomic block takes the write lock
+# then, also the ones which only read (like the change views of the admin), which makes them wait for the writers
+# and the writers for them; readers outside of atomic blocks (most of the API) are not affected
+SQLITE_IMMEDIATE_TRANSACTIONS = env.bool('DJANGO_SQLITE_IMMEDIATE_TRANSACTIONS', default=True)
+
+# CACHES
+# ------------------------------------------------------------------------------
+# The cached reviews, the read-your-writes pins and the Idempotency-Key responses have to be shared by the worker
+# processes, a change seen by one of them has to be seen by all. By default they're kept in a table of a separate
+# SQLite database (so the cache writes don't wait for the lock of the main database), created with ./manage.py
+# createcachetable --database cache. DJANGO_REVIEW_CACHE_URL can point to memcached instead, for example
+# memcache://127.0.0.1:11211 (https://django-environ.readthedocs.io/en/latest/#supported-types)
+DATABASES['cache'] = env.db_url_config(  # noqa F405
+    env('DJANGO_REVIEW_CACHE_DATABASE_URL', default=f"sqlite:///{ROOT_DIR.path('cache.db')}")  # noqa F405
+)
+REVIEW_CACHE_DATABASE = 'cache'
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': '',
+    },
+    'shared': env.cache('DJANGO_REVIEW_CACHE_URL', default='dbcache://review_cache?max_entries=100000'),
+    # a table of its own, the responses stored for the retries must not be culled with the cached reviews
+    'idempotency': env.cache('DJANGO_REVIEW_IDEMPOTENCY_CACHE_URL',
+                             default='dbcache://review_idempotency?max_entries=1000000'),
+}
+REVIEW_CACHE_ALIAS = env('DJANGO_REVIEW_CACHE_ALIAS', default='shared')
+REVIEW_IDEMPOTENCY_CACHE_ALIAS = env('DJANGO_REVIEW_IDEMPOTENCY_CACHE_ALIAS', default='idempotency')
+
+for database in DATABASES.values():  # noqa F405
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    if database['ENGINE'] == "django.db.backends.sqlite3":
+        database['ENGINE'] = "review.backends.sqlite3"
+        database.setdefault('OPTIONS', {}).update(
+            pragmas=SQLITE_PRAGMAS, immediate_transactions=SQLITE_IMMEDIATE_TRANSACTIONS  # noqa F405
+        )
@@ -19,8 +19,20 @@ DATABASES = {
     'default': {
         'ENGINE': "django.db.backends.sqlite3",
         'NAME': ":memory:",
-    }
+    },
+    # stand-in replica, a separate database the tests can fill differently, see review.routers
+    'replica': {
+        'ENGINE': "django.db.backends.sqlite3",
+        'NAME': ":memory:",
+    },
+    # stand-in separate archive database, see review.routers
+    'archive': {
+        'ENGINE': "django.db.backends.sqlite3",
+        'NAME': ":memory:",
+    },
 }
+# the replica and the archive database are only used by the tests that enable them
+DATABASE_REPLICAS = []
 
 
 TEMPLATES[0]['OPTIONS']['debug'] = True  # for coverage
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from review.authentication import invalidate_token
+from review.cache import delete_representation
+from review.ingest import review_queue
+from review.models import ArchivedReview, CompanyRating, Review, ReviewChange
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    # deactivation is what matters for authentication, but any change would leave a stale user in the cache
+    if created:
+        return
+
+    for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+        invalidate_token(key)
+
+
+@receiver(post_delete, sender=User)
+def delete_archived_reviews(sender, instance, **kwargs):
+    # the archive may be in another database, out of reach of the cascade (and of the signals of the reviews,
+    # which take the ratings of the deleted reviews off the company summaries)
+    archived = ArchivedReview.objects.filter(reviewer_id=instance.pk)
+    CompanyRating.objects.record(archived.only("company_name", "rating"), sign=-1)
+    archived.delete()
+
+
+@receiver(pre_save, sender=Review)
+def remember_company_rating(sender, instance, using, **kwargs):
+    # an edited review (in the admin) may move from one rating or company to another
+    instance._saved_rating = None
+    if not instance._state.adding:
+        instance._saved_rating = Review.objects.using(using).filter(pk=instance.pk).values_list(
+            "company_name", "rating"
+        ).first()
+
+
+@receiver(post_save, sender=Review)
+def record_company_rating(sender, instance, created, **kwargs):
+    if created:
+        CompanyRating.objects.record([instance])
+        return
+
+    saved = getattr(instance, "_saved_rating", None)
+    if saved is None or saved == (instance.company_name, instance.rating):
+        return
+    company_name, rating = saved
+    CompanyRating.objects.record([Review(company_name=company_name, rating=rating)], sign=-1)
+    CompanyRating.objects.record([instance])
+
+
+@receiver(post_delete, sender=Review)
+def remove_company_rating(sender, instance, **kwargs):
+    CompanyRating.objects.record([instance], sign=-1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_cached_representation(sender, instance, created=False, **kwargs):
+    # a new review has nothing cached yet, an edited one (in the admin) has its old representation cached
+    if not created:
+        delete_representation(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def log_created_review(sender, instance, created, **kwargs):
+    if created:
+        ReviewChange.objects.record([instance], ReviewChange.CREATED)
+
+
+@receiver(post_delete, sender=Review)
+def log_deleted_review(sender, instance, **kwargs):
+    ReviewChange.objects.record([instance], ReviewChange.DELETED)
+
+
+@receiver(request_started)
+def start_ingest_flusher(sender, **kwargs):
+    # not only on the first queued review: the spool may still have the reviews accepted before a restart
+    if settings.REVIEW_INGEST_QUEUE:
+        review_queue.start()
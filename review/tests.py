@@ -1,13 +1,41 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import time
 from datetime import timedelta as td
+from io import StringIO
+from unittest import mock, skipIf
 
-from django.test import TestCase
+import coreapi
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 
-from review.models import Review
+from review.asgi import ASGIApplication
+from review.authentication import token_cache
+from review.compat import brotli, msgpack
+from review.idempotency import IN_FLIGHT, IN_FLIGHT_TIMEOUT, _key as idempotency_key
+from review.ingest import ReviewQueue, review_queue
+from review.metrics import registry
+from review.models import ArchivedReview, CompanyRating, Review, ReviewChange
+from review.routers import ReplicaRouter
+from review.schema import schema_cache, write_schema
+from review.serializers import ReviewSerializer, review_values_serializer
 
 
 class ReviewTestCase(TestCase):
@@ -95,7 +123,7 @@ class ReviewTestCase(TestCase):
 
         response = self._get("/api/v1/reviews/")
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), self_object_count + 1)
+        self.assertEqual(len(response.json()['results']), self_object_count + 1)
 
     def test_create_w_missing_rating(self):
         self._run_and_assert_create({'rating': None}, "rating", "This field is required.")
@@ -149,7 +177,7 @@ class ReviewTestCase(TestCase):
     def test_list_wo_reviews(self):
         resp = self._get(f"/api/v1/reviews/")
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(len(resp.json()), 0)
+        self.assertEqual(len(resp.json()['results']), 0)
 
     def test_review_model_str(self):
         review = Review.objects.latest("created_at")
@@ -157,3 +185,1560 @@ class ReviewTestCase(TestCase):
             str(review),
             f"{review.rating} - {review.title} - {review.company_name} - {review.reviewer.username}"
         )
+
+
+class AuthenticatedTestCase(TestCase):
+    """
+    Provides a client authenticated with ``cls.token`` and empty caches, rolling back the test transaction does
+    not send the signals which would otherwise invalidate the cached tokens and reviews.
+    """
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+
+class ReviewPaginationTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="paginated")
+        cls.token = Token.objects.create(user=cls.user)
+        Review.objects.bulk_create([
+            Review(title=f"t{i}", summary="s", rating=3, company_name="c", reviewer=cls.user) for i in range(7)
+        ])
+        # identical timestamps for part of the set, so the id has to break the tie
+        now = timezone.now()
+        ids = list(Review.objects.filter(reviewer=cls.user).values_list("id", flat=True))
+        Review.objects.filter(id__in=ids[:4]).update(created_at=now)
+        Review.objects.filter(id__in=ids[4:]).update(created_at=now - td(days=1))
+        cls.expected = list(Review.objects.filter(reviewer=cls.user).values_list("id", flat=True))
+
+    def _get(self, url):
+        return self.client.get(url)
+
+    def _walk(self, url, key):
+        ids = []
+        while url:
+            response = self._get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(r['id'] for r in data['results'])
+            url = data[key]
+        return ids
+
+    def test_ordering_matches_model(self):
+        self.assertEqual(self.expected, sorted(self.expected, reverse=True))
+
+    def test_forward_and_backward(self):
+        ids = self._walk("/api/v1/reviews/?page_size=2", "next")
+        self.assertEqual(ids, self.expected)
+
+        response = self._get("/api/v1/reviews/?page_size=2")
+        last = response.json()
+        while last['next']:
+            last = self._get(last['next']).json()
+        self.assertIsNone(last['next'])
+
+        pages = [[r['id'] for r in last['results']]]
+        url = last['previous']
+        while url:
+            data = self._get(url).json()
+            pages.insert(0, [r['id'] for r in data['results']])
+            url = data['previous']
+        self.assertEqual([i for page in pages for i in page], self.expected)
+
+    def test_query_count_does_not_depend_on_depth(self):
+        response = self._get("/api/v1/reviews/?page_size=2")
+        url = response.json()['next']
+        while url:
+            # the ETag, the page and the (not yet cached) reviews on it
+            with self.assertNumQueries(3):
+                response = self._get(url)
+            url = response.json()['next']
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self._get("/api/v1/reviews/?cursor=invalid").status_code, 404)
+        self.assertEqual(self._get("/api/v1/reviews/?cursor=cD1ub3Q%3D").status_code, 404)
+
+
+class CachedTokenAuthenticationTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="cached")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.user = User.objects.get(pk=self.user.pk)
+        self.token = Token.objects.get(user=self.user)
+        super().setUp()
+
+    def test_second_request_skips_auth_query(self):
+        # the token, the ETag of the list and the list itself
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 401)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_token_delete_invalidates(self):
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 401)
+
+    def test_user_deactivation_invalidates(self):
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 401)
+
+    def test_expired_entry(self):
+        token_cache.ttl = -1
+        try:
+            self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+            with self.assertNumQueries(3):
+                self.client.get("/api/v1/reviews/")
+        finally:
+            token_cache.ttl = 60
+
+    def test_size_is_bounded(self):
+        token_cache.max_size = 2
+        try:
+            for i in range(5):
+                token_cache.set(str(i), i)
+            self.assertEqual(len(token_cache), 2)
+            self.assertIsNone(token_cache.get("0"))
+            self.assertEqual(token_cache.get("4"), 4)
+        finally:
+            token_cache.max_size = 10000
+
+    @override_settings(TOKEN_AUTH_CACHE_ALIAS="default")
+    def test_shared_cache(self):
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+        token_cache.clear()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 200)
+
+        self.token.delete()
+        token_cache.clear()
+        self.assertEqual(self.client.get("/api/v1/reviews/").status_code, 401)
+
+
+@override_settings(REVIEW_BULK_CREATE_LIMIT=3)
+class ReviewBulkCreateTestCase(AuthenticatedTestCase):
+    REVIEW_PAYLOAD = {'rating': 5, 'title': "test", 'summary': "ok", 'company_name': "szia"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="bulk")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def _post(self, data):
+        return self.client.post("/api/v1/reviews/bulk/", data, format="json")
+
+    def test_create(self):
+        payload = [dict(self.REVIEW_PAYLOAD, title=f"t{i}") for i in range(3)]
+        response = self._post(payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'count': 3})
+
+        reviews = Review.objects.filter(reviewer=self.user).order_by("id")
+        self.assertEqual([r.title for r in reviews], ["t0", "t1", "t2"])
+        for review in reviews:
+            self.assertEqual(review.ip_address, "127.0.0.1")
+            self.assertAlmostEqual(review.created_at, timezone.now(), delta=td(seconds=2))
+
+    def test_single_insert(self):
+        payload = [self.REVIEW_PAYLOAD] * 3
+        self._post([])  # warm up the token cache
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._post(payload).status_code, 201)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "review_review"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_errors_by_index(self):
+        payload = [self.REVIEW_PAYLOAD, dict(self.REVIEW_PAYLOAD, rating=6), dict(self.REVIEW_PAYLOAD, title="")]
+        response = self._post(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'errors': [
+            {'index': 1, 'errors': {'rating': ["Ensure this value is less than or equal to 5."]}},
+            {'index': 2, 'errors': {'title': ["This field may not be blank."]}},
+        ]})
+        self.assertFalse(Review.objects.filter(reviewer=self.user).exists())
+
+    def test_limit(self):
+        response = self._post([self.REVIEW_PAYLOAD] * 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("non_field_errors", response.json())
+        self.assertFalse(Review.objects.filter(reviewer=self.user).exists())
+
+    def test_not_a_list(self):
+        response = self._post(self.REVIEW_PAYLOAD)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("non_field_errors", response.json())
+
+    def test_not_authenticated(self):
+        response = APIClient().post("/api/v1/reviews/bulk/", [self.REVIEW_PAYLOAD], format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class IdempotencyKeyTestCase(AuthenticatedTestCase):
+    REVIEW_PAYLOAD = {'rating': 5, 'title': "test", 'summary': "ok", 'company_name': "szia"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="retrying")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def _post(self, data=None, key="key-1"):
+        return self.client.post("/api/v1/reviews/", data or self.REVIEW_PAYLOAD, format="json",
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        response = self._post()
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+
+        with self.assertNumQueries(0):
+            retry = self._post()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), response.json())
+        self.assertEqual(Review.objects.filter(reviewer=self.user).count(), 1)
+
+        self.assertEqual(self._post(key="key-2").status_code, 201)
+        self.assertEqual(self.client.post("/api/v1/reviews/", self.REVIEW_PAYLOAD, format="json").status_code, 201)
+        self.assertEqual(Review.objects.filter(reviewer=self.user).count(), 3)
+
+    def test_other_payload(self):
+        self._post()
+        response = self._post(dict(self.REVIEW_PAYLOAD, rating=1))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Review.objects.filter(reviewer=self.user).count(), 1)
+
+    def test_per_user(self):
+        self._post()
+        other = Token.objects.create(user=User.objects.create(username="other"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {other.key}")
+        self.assertFalse(self._post().has_header("Idempotent-Replayed"))
+        self.assertEqual(Review.objects.count(), 2)
+
+    def test_in_flight(self):
+        cache.add(idempotency_key(self.user.pk, "key-1"), IN_FLIGHT, IN_FLIGHT_TIMEOUT)
+        # only the token
+        with self.assertNumQueries(1):
+            response = self._post()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Review.objects.exists())
+
+    def test_invalid_not_stored(self):
+        self.assertEqual(self._post(dict(self.REVIEW_PAYLOAD, rating=6)).status_code, 400)
+        self.assertEqual(self._post().status_code, 201)
+
+    @override_settings(REVIEW_IDEMPOTENCY_CACHE_ALIAS="idempotency", CACHES={
+        'default': {'BACKEND': "django.core.cache.backends.locmem.LocMemCache"},
+        'idempotency': {'BACKEND': "django.core.cache.backends.db.DatabaseCache", 'LOCATION': "review_idempotency"},
+    })
+    def test_separate_cache(self):
+        call_command("createcachetable")
+        self.assertEqual(self._post().status_code, 201)
+        self.assertEqual(self._post()["Idempotent-Replayed"], "true")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM review_idempotency")
+            self.assertEqual(cursor.fetchone(), (1, ))
+
+    def test_invalid_key(self):
+        self.assertEqual(self._post(key="").status_code, 400)
+        self.assertEqual(self._post(key="k" * 256).status_code, 400)
+        self.assertFalse(Review.objects.exists())
+
+
+class ReviewDetailScopeTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="scoped")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.review = Review.objects.create(title="t", summary="s", rating=3, company_name="c", reviewer=cls.user)
+        cls.foreign = Review.objects.create(title="t", summary="s", rating=3, company_name="c",
+                                            reviewer=User.objects.create(username="scoped2"))
+
+    def _get(self, review_id):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/v1/reviews/{review_id}/")
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_own(self):
+        response, queries = self._get(self.review.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['reviewer'], "scoped")
+        # the token, the ETag and the review, which is read without the user
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn("auth_user", queries[-1])
+        self.assertIn('"reviewer_id" = ', queries[-1])
+
+    def test_forbidden(self):
+        response, queries = self._get(self.foreign.id)
+        self.assertEqual(response.status_code, 403)
+        # the token, the ETag (the scoped lookup) and the reviewer of the review, the archive isn't looked up
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any("auth_user" in query for query in queries[1:]))
+        response, queries = self._get(12345)
+        self.assertEqual(response.status_code, 404)
+        # the token is cached by now, the ETag and the reviewer of the review and of the archived one
+        self.assertEqual(len(queries), 3)
+
+    @override_settings(REVIEW_DETAIL_FORBIDDEN_STATUS=404)
+    def test_not_found(self):
+        response, queries = self._get(self.foreign.id)
+        self.assertEqual(response.status_code, 404)
+        # the token, the ETag and the scoped lookup in the archive
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(self._get(12345)[0].status_code, 404)
+
+
+class ReviewBatchRetrieveTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="batch")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.reviews = [
+            Review.objects.create(title=f"t{i}", summary="s", rating=3, company_name="c", reviewer=cls.user)
+            for i in range(3)
+        ]
+        cls.foreign = Review.objects.create(title="t", summary="s", rating=3, company_name="c",
+                                            reviewer=User.objects.create(username="batch2"))
+
+    def _get(self, ids, **params):
+        return self.client.get("/api/v1/reviews/batch/", {'ids': ",".join(map(str, ids)), **params})
+
+    def test_retrieve(self):
+        first, second, third = self.reviews
+        ids = [third.id, self.foreign.id, first.id, 12345, third.id]
+        # the token and the reviews
+        with self.assertNumQueries(2):
+            response = self._get(ids)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['id'] for result in results], ids)
+        self.assertEqual(results[0], self.client.get(f"/api/v1/reviews/{third.id}/").json())
+        self.assertEqual(results[0], results[4])
+        self.assertEqual(results[1], {'id': self.foreign.id, 'detail': "Not found."})
+        self.assertEqual(results[3], {'id': 12345, 'detail': "Not found."})
+
+        # the found ones come from the cache from now on
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get([first.id, third.id]).json()['results'], [results[2], results[0]])
+
+    def test_fields(self):
+        response = self._get([self.reviews[0].id, 12345], fields="title")
+        self.assertEqual(response.json()['results'], [{'title': "t0"}, {'id': 12345, 'detail': "Not found."}])
+
+    @override_settings(REVIEW_BATCH_RETRIEVE_LIMIT=3)
+    def test_invalid(self):
+        for ids, message in (("", "This field is required."),
+                             ("1,a", "Enter a comma separated list of integers."),
+                             ("1,2,3,4", "Ensure this list has no more than 3 items.")):
+            response = self.client.get("/api/v1/reviews/batch/", {'ids': ids})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'ids': [message]})
+
+
+@override_settings(REVIEW_EXPORT_CHUNK_SIZE=2)
+class ReviewChangeFeedTestCase(AuthenticatedTestCase):
+    REVIEW_PAYLOAD = {'rating': 5, 'title': "test", 'summary': "ok", 'company_name': "szia"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="feed")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def _changes(self, **params):
+        response = self.client.get("/api/v1/reviews/changes/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _create(self, **data):
+        return Review.objects.create(reviewer=self.user, **dict(self.REVIEW_PAYLOAD, **data))
+
+    def test_created_and_deleted(self):
+        first = self._create().id
+        self.client.post("/api/v1/reviews/", self.REVIEW_PAYLOAD, format="json")
+        second = Review.objects.latest("id").id
+        Review.objects.filter(id=first).delete()
+
+        feed = self._changes()
+        self.assertEqual([(c['action'], c['review']) for c in feed['results']],
+                         [("created", first), ("created", second), ("deleted", first)])
+        self.assertEqual(feed['cursor'], feed['results'][-1]['cursor'])
+        self.assertFalse(feed['more'])
+
+        self.assertEqual(self._changes(cursor=feed['cursor']), {'cursor': feed['cursor'], 'more': False,
+                                                                'results': []})
+        self._create()
+        self.assertEqual(len(self._changes(cursor=feed['cursor'])['results']), 1)
+
+    def test_bulk_created(self):
+        response = self.client.post("/api/v1/reviews/bulk/", [self.REVIEW_PAYLOAD] * 3, format="json")
+        self.assertEqual(response.status_code, 201)
+        ids = list(Review.objects.filter(reviewer=self.user).order_by("id").values_list("id", flat=True))
+        self.assertEqual([c['review'] for c in self._changes()['results']], ids)
+
+    def test_limit(self):
+        for i in range(3):
+            self._create()
+        feed = self._changes(limit=2)
+        self.assertEqual(len(feed['results']), 2)
+        self.assertTrue(feed['more'])
+        feed = self._changes(limit=2, cursor=feed['cursor'])
+        self.assertEqual(len(feed['results']), 1)
+        self.assertFalse(feed['more'])
+
+    def test_other_reviewer(self):
+        other = User.objects.create(username="other")
+        Review.objects.create(reviewer=other, **self.REVIEW_PAYLOAD)
+        self.assertEqual(self._changes()['results'], [])
+
+    def test_deleted_user(self):
+        other = User.objects.create(username="other")
+        Review.objects.create(reviewer=other, **self.REVIEW_PAYLOAD)
+        other_id = other.id
+        other.delete()
+        self.assertFalse(Review.objects.filter(reviewer_id=other_id).exists())
+        # logged while the user is deleted
+        self.assertEqual(list(ReviewChange.objects.filter(reviewer_id=other_id).values_list("action", flat=True)),
+                         ["deleted"])
+
+    def test_wait(self):
+        cursor = self._create().id
+
+        def sleep(seconds):
+            # a review created by someone else while the request waits
+            self.assertLessEqual(seconds, 0.5)
+            self._create()
+
+        with mock.patch("review.views.time.sleep", side_effect=sleep) as patched:
+            feed = self._changes(cursor=ReviewChange.objects.latest("id").id, wait=10)
+        self.assertEqual(patched.call_count, 1)
+        self.assertEqual([c['review'] for c in feed['results']], [cursor + 1])
+
+    @override_settings(REVIEW_CHANGES_MAX_WAIT=0)
+    def test_wait_limit(self):
+        with mock.patch("review.views.time.sleep") as patched:
+            self.assertEqual(self._changes(wait=10)['results'], [])
+        patched.assert_not_called()
+
+    def test_invalid(self):
+        for params in ({'cursor': "a"}, {'cursor': -1}, {'limit': 0}, {'wait': "x"}):
+            self.assertEqual(self.client.get("/api/v1/reviews/changes/", params).status_code, 400)
+
+    def test_not_authenticated(self):
+        self.assertEqual(APIClient().get("/api/v1/reviews/changes/").status_code, 401)
+
+
+class ReviewArchiveTestCase(AuthenticatedTestCase):
+    multi_db = True
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="archived")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.old = [
+            Review.objects.create(title=f"old {i}", summary="s", rating=i + 1, company_name="c", reviewer=cls.user)
+            for i in range(3)
+        ]
+        for i, review in enumerate(cls.old):
+            Review.objects.filter(id=review.id).update(created_at=timezone.now() - td(days=100 + i))
+        cls.recent = Review.objects.create(title="recent", summary="s", rating=5, company_name="c", reviewer=cls.user)
+
+    def _archive(self):
+        out = StringIO()
+        call_command("archive_reviews", days=30, chunk_size=2, stdout=out)
+        return out.getvalue().strip()
+
+    def test_archive(self):
+        changes = ReviewChange.objects.count()
+        self.assertTrue(self._archive().startswith("Archived 3 review(s)"))
+        self.assertEqual(list(Review.objects.values_list("id", flat=True)), [self.recent.id])
+        archived = ArchivedReview.objects.get(id=self.old[0].id)
+        self.assertEqual((archived.title, archived.reviewer_id), ("old 0", self.user.id))
+        # moved, not deleted
+        self.assertEqual(CompanyRating.objects.get(company_name="c").review_count, 4)
+        self.assertEqual(ReviewChange.objects.count(), changes)
+        call_command("rebuild_company_ratings", check=True, stdout=StringIO())
+
+        self.assertTrue(self._archive().startswith("Archived 0 review(s)"))
+
+    def test_list(self):
+        self._archive()
+        self.assertEqual([r['title'] for r in self.client.get("/api/v1/reviews/").json()['results']], ["recent"])
+
+        results = self.client.get("/api/v1/reviews/", {'archived': "true"}).json()['results']
+        self.assertEqual([r['title'] for r in results], ["old 0", "old 1", "old 2"])
+        self.assertEqual(results[0]['reviewer'], "archived")
+        results = self.client.get("/api/v1/reviews/", {'archived': "true", 'rating': 2, 'fields': "title"}).json()
+        self.assertEqual(results['results'], [{'title': "old 1"}])
+        self.assertEqual(self.client.get("/api/v1/reviews/", {'archived': "yes"}).status_code, 400)
+
+    def test_detail(self):
+        self._archive()
+        response = self.client.get(f"/api/v1/reviews/{self.old[0].id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['title'], response.json()['reviewer']), ("old 0", "archived"))
+        response = self.client.get(f"/api/v1/reviews/{self.old[0].id}/", {'fields': "rating"})
+        self.assertEqual(response.json(), {'rating': 1})
+
+        other = Token.objects.create(user=User.objects.create(username="other"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {other.key}")
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.old[1].id}/").status_code, 403)
+
+    def test_deleted_user(self):
+        self._archive()
+        self.user.delete()
+        self.assertFalse(ArchivedReview.objects.exists())
+        self.assertFalse(CompanyRating.objects.filter(company_name="c", review_count__gt=0).exists())
+        call_command("rebuild_company_ratings", check=True, stdout=StringIO())
+
+    @override_settings(REVIEW_ARCHIVE_DATABASE="archive")
+    def test_separate_database(self):
+        self._archive()
+        self.assertEqual(ArchivedReview.objects.using("archive").count(), 3)
+        self.assertFalse(ArchivedReview.objects.using("default").exists())
+        # the users are not in the archive database
+        results = self.client.get("/api/v1/reviews/", {'archived': "true"}).json()['results']
+        self.assertEqual([(r['title'], r['reviewer']) for r in results][0], ("old 0", "archived"))
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.old[2].id}/").status_code, 200)
+
+
+class ReviewExportTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="export")
+        cls.token = Token.objects.create(user=cls.user)
+        for i in range(5):
+            Review.objects.create(title=f"t{i}", summary="line\n\"quoted\", ű", rating=i + 1, company_name="c",
+                                  reviewer=cls.user)
+        Review.objects.create(title="other", summary="s", rating=1, company_name="c",
+                              reviewer=User.objects.create(username="export2"))
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response = self.client.get("/api/v1/reviews/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="reviews.ndjson"', response["Content-Disposition"])
+
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        listed = self.client.get("/api/v1/reviews/").json()['results']
+        self.assertEqual(rows, listed)
+
+    def test_csv(self):
+        for response in (self.client.get("/api/v1/reviews/export/?format=csv"),
+                         self.client.get("/api/v1/reviews/export/", HTTP_ACCEPT="text/csv")):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+
+            rows = list(csv.DictReader(self._content(response).splitlines(keepends=True)))
+            listed = self.client.get("/api/v1/reviews/").json()['results']
+            self.assertEqual(rows, [{key: str(value) for key, value in row.items()} for row in listed])
+
+    def test_single_query(self):
+        self.client.get("/api/v1/reviews/export/")  # warm up the token cache
+        with self.assertNumQueries(1):
+            self._content(self.client.get("/api/v1/reviews/export/"))
+
+    def test_not_authenticated(self):
+        self.assertEqual(APIClient().get("/api/v1/reviews/export/").status_code, 401)
+
+
+class CompanyRatingTestCase(AuthenticatedTestCase):
+    REVIEW_PAYLOAD = {'rating': 5, 'title': "test", 'summary': "ok", 'company_name': "acme"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="rating")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def _create(self, company_name, rating):
+        data = dict(self.REVIEW_PAYLOAD, company_name=company_name, rating=rating)
+        self.assertEqual(self.client.post("/api/v1/reviews/", data, format="json").status_code, 201)
+
+    def test_incremental_updates(self):
+        self._create("acme", 5)
+        self._create("acme", 2)
+        self._create("other/company", 1)
+        response = self.client.post("/api/v1/reviews/bulk/", [
+            dict(self.REVIEW_PAYLOAD, rating=2), dict(self.REVIEW_PAYLOAD, rating=4),
+        ], format="json")
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get("/api/v1/companies/acme/rating/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'company_name': "acme", 'review_count': 4, 'average_rating': 3.25,
+            'histogram': {'1': 0, '2': 2, '3': 0, '4': 1, '5': 1},
+        })
+        self.assertEqual(self.client.get("/api/v1/companies/other/company/rating/").json()['review_count'], 1)
+
+        Review.objects.filter(company_name="acme", rating=2).delete()
+        rating = CompanyRating.objects.get(company_name="acme")
+        self.assertEqual((rating.review_count, rating.rating_sum, rating.rating_2), (2, 9, 0))
+        self.assertEqual(rating.average_rating, 4.5)
+
+        Review.objects.filter(company_name="acme").delete()
+        self.assertIsNone(self.client.get("/api/v1/companies/acme/rating/").json()['average_rating'])
+
+    def test_edited_review(self):
+        self._create("acme", 5)
+        self._create("acme", 3)
+        review = Review.objects.get(rating=5)
+
+        review.rating = 1
+        review.save()
+        rating = CompanyRating.objects.get(company_name="acme")
+        self.assertEqual((rating.review_count, rating.rating_sum, rating.rating_1, rating.rating_5), (2, 4, 1, 0))
+
+        review.company_name = "other"
+        review.save()
+        self.assertEqual(CompanyRating.objects.get(company_name="acme").histogram,
+                         {'1': 0, '2': 0, '3': 1, '4': 0, '5': 0})
+        self.assertEqual(CompanyRating.objects.get(company_name="other").histogram,
+                         {'1': 1, '2': 0, '3': 0, '4': 0, '5': 0})
+
+        review.title = "edited"
+        review.save()
+        call_command("rebuild_company_ratings", "--check", stdout=StringIO())
+
+    def test_single_query_read(self):
+        self._create("acme", 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/v1/companies/acme/rating/").status_code, 200)
+
+    def test_not_existing(self):
+        self.assertEqual(self.client.get("/api/v1/companies/nope/rating/").status_code, 404)
+
+    def test_rebuild_command(self):
+        self._create("acme", 5)
+        self._create("acme", 3)
+        self._create("other", 1)
+        call_command("rebuild_company_ratings", "--check", stdout=StringIO())
+
+        CompanyRating.objects.filter(company_name="acme").update(review_count=10)
+        CompanyRating.objects.filter(company_name="other").delete()
+        CompanyRating.objects.create(company_name="ghost", review_count=1, rating_sum=1, rating_1=1)
+        with self.assertRaisesMessage(CommandError, "3 company rating(s) drifted."):
+            call_command("rebuild_company_ratings", "--check", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_company_ratings", stdout=out)
+        self.assertIn("Rebuilt 2 company rating(s), fixed 3.", out.getvalue())
+        self.assertEqual(CompanyRating.objects.get(company_name="acme").review_count, 2)
+        self.assertFalse(CompanyRating.objects.filter(company_name="ghost").exists())
+        call_command("rebuild_company_ratings", "--check", stdout=StringIO())
+
+
+class ReviewSearchTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="search")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.best = Review.objects.create(title="Great pizza", summary="the crust was fine", rating=5,
+                                         company_name="Luigi", reviewer=cls.user)
+        cls.other = Review.objects.create(title="Dinner", summary="we had pizza and pasta", rating=3,
+                                          company_name="Mario", reviewer=cls.user)
+        Review.objects.create(title="Lunch", summary="no match here", rating=3, company_name="Mario",
+                              reviewer=cls.user)
+        Review.objects.create(title="Pizza", summary="pizza pizza", rating=1, company_name="Luigi",
+                              reviewer=User.objects.create(username="search2"))
+
+    def _search(self, query, **params):
+        return self.client.get("/api/v1/reviews/search/", dict(q=query, **params))
+
+    def test_ranked_and_scoped(self):
+        response = self._search("pizza")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.json()['results']], [self.best.id, self.other.id])
+        self.assertEqual(response.json()['results'][0]['reviewer'], "search")
+
+        self.assertEqual([r['id'] for r in self._search("pizza", limit=1).json()['results']], [self.best.id])
+        self.assertEqual([r['id'] for r in self._search("mario pasta").json()['results']], [self.other.id])
+
+    def test_index_follows_changes(self):
+        review = Review.objects.create(title="Sushi", summary="fresh", rating=5, company_name="Ito",
+                                       reviewer=self.user)
+        self.assertEqual([r['id'] for r in self._search("sushi").json()['results']], [review.id])
+
+        Review.objects.filter(id=review.id).update(title="Ramen")
+        self.assertEqual(self._search("sushi").json()['results'], [])
+        self.assertEqual(len(self._search("ramen").json()['results']), 1)
+
+        review.delete()
+        self.assertEqual(self._search("ramen").json()['results'], [])
+
+    def test_query_syntax_is_literal(self):
+        for query in ('"', "pizza OR", "NEAR(", "title:pizza", "*"):
+            self.assertEqual(self._search(query).status_code, 200)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get("/api/v1/reviews/search/").status_code, 400)
+        self.assertEqual(self._search("  ").status_code, 400)
+        self.assertEqual(self._search("pizza", limit="a").status_code, 400)
+        self.assertEqual(self._search("pizza", limit=0).status_code, 400)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER review_review_fts_ai")
+        Review.objects.create(title="Tacos", summary="s", rating=5, company_name="c", reviewer=self.user)
+        self.assertEqual(self._search("tacos").json()['results'], [])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(len(self._search("tacos").json()['results']), 1)
+
+
+class ConditionalGetTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="etag")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.review = Review.objects.create(title="t", summary="s", rating=3, company_name="c", reviewer=cls.user)
+        cls.foreign = Review.objects.create(title="t", summary="s", rating=3, company_name="c",
+                                            reviewer=User.objects.create(username="etag2"))
+
+    def _assert_not_modified(self, url, etag):
+        # only the cheap validator query runs, auth is cached
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_list(self):
+        response = self.client.get("/api/v1/reviews/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self._assert_not_modified("/api/v1/reviews/", etag)
+
+        self.assertNotEqual(self.client.get("/api/v1/reviews/?page_size=1")["ETag"], etag)
+
+        review = Review.objects.create(title="t", summary="s", rating=3, company_name="c", reviewer=self.user)
+        response = self.client.get("/api/v1/reviews/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        etag = response["ETag"]
+
+        review.delete()
+        response = self.client.get("/api/v1/reviews/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_is_per_user(self):
+        etag = self.client.get("/api/v1/reviews/")["ETag"]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.foreign.reviewer).key}")
+        self.assertEqual(client.get("/api/v1/reviews/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail(self):
+        url = f"/api/v1/reviews/{self.review.id}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self._assert_not_modified(url, response["ETag"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_edited_review(self):
+        url = f"/api/v1/reviews/{self.review.id}/"
+        list_etag, detail_etag = self.client.get("/api/v1/reviews/")["ETag"], self.client.get(url)["ETag"]
+
+        # an edit in the admin
+        self.review.title = "edited"
+        self.review.save()
+        response = self.client.get("/api/v1/reviews/", HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], list_etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], detail_etag)
+
+    def test_detail_errors(self):
+        response = self.client.get(f"/api/v1/reviews/{self.foreign.id}/", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertEqual(self.client.get("/api/v1/reviews/12345/", HTTP_IF_NONE_MATCH="*").status_code, 404)
+
+
+class RepresentationCacheTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="cached")
+        cls.token = Token.objects.create(user=cls.user)
+        for i in range(3):
+            Review.objects.create(title=f"t{i}", summary="s", rating=3, company_name="c", reviewer=cls.user)
+        cls.foreign = Review.objects.create(title="t", summary="s", rating=3, company_name="c",
+                                            reviewer=User.objects.create(username="cached2"))
+
+    def test_list(self):
+        uncached = self.client.get("/api/v1/reviews/").content
+        # the ETag and the ids of the page
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get("/api/v1/reviews/").content, uncached)
+
+        review = Review.objects.filter(reviewer=self.user).first()
+        review.delete()
+        self.assertNotIn(review.id, [r['id'] for r in self.client.get("/api/v1/reviews/").json()['results']])
+
+    def test_partial_hits(self):
+        review = Review.objects.filter(reviewer=self.user).first()
+        self.client.get(f"/api/v1/reviews/{review.id}/")
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get("/api/v1/reviews/").json()['results']
+        self.assertEqual(len(data), 3)
+        self.assertIn(f'"id" IN ({", ".join(str(r["id"]) for r in data[1:])})', queries.captured_queries[-1]['sql'])
+
+    def test_detail(self):
+        review = Review.objects.filter(reviewer=self.user).first()
+        url = f"/api/v1/reviews/{review.id}/"
+        uncached = self.client.get(url).content
+        # the ETag only
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).content, uncached)
+
+    def test_created_review_is_cached(self):
+        data = {'rating': 5, 'title': "test", 'summary': "ok", 'company_name': "szia"}
+        created = self.client.post("/api/v1/reviews/", data, format="json").json()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(f"/api/v1/reviews/{created['id']}/").json(), created)
+
+    def test_edited_review(self):
+        review = Review.objects.filter(reviewer=self.user).first()
+        url = f"/api/v1/reviews/{review.id}/"
+        self.client.get("/api/v1/reviews/")
+        self.client.get(url)
+
+        # an edit in the admin
+        review.title = "edited"
+        review.save()
+        self.assertEqual(self.client.get(url).json()['title'], "edited")
+        self.assertIn("edited", [r['title'] for r in self.client.get("/api/v1/reviews/").json()['results']])
+
+    def test_deleted_review(self):
+        review = Review.objects.filter(reviewer=self.user).first()
+        url = f"/api/v1/reviews/{review.id}/"
+        self.client.get(url)
+        # deleted without the signals, the cached representation is left behind
+        Review.objects.filter(pk=review.pk)._raw_delete(connection.alias)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_foreign_entry_is_not_served(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.foreign.reviewer).key}")
+        self.assertEqual(client.get(f"/api/v1/reviews/{self.foreign.id}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.foreign.id}/").status_code, 403)
+
+    def test_renamed_reviewer(self):
+        self.client.get("/api/v1/reviews/")
+        self.user.username = "renamed"
+        self.user.save()
+        self.assertEqual({r['reviewer'] for r in self.client.get("/api/v1/reviews/").json()['results']}, {"renamed"})
+
+
+class SparseFieldsTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="sparse")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.review = Review.objects.create(title="t", summary="long " * 100, rating=3, company_name="c",
+                                           reviewer=cls.user)
+
+    def _get(self, url, fields):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': fields})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), queries.captured_queries[-1]['sql']
+
+    def test_list(self):
+        data, sql = self._get("/api/v1/reviews/", "title,rating")
+        self.assertEqual(data['results'], [{'rating': 3, 'title': "t"}])
+        self.assertNotIn('"summary"', sql)
+        data, sql = self._get("/api/v1/reviews/", "id,reviewer")
+        self.assertEqual(data['results'], [{'id': self.review.id, 'reviewer': "sparse"}])
+
+        # the partial representations are not cached
+        full = self.client.get("/api/v1/reviews/").json()['results'][0]
+        self.assertEqual(full['summary'], self.review.summary)
+        with self.assertNumQueries(2):
+            data, sql = self._get("/api/v1/reviews/", "summary")
+        self.assertEqual(data['results'], [{'summary': self.review.summary}])
+
+    def test_detail(self):
+        url = f"/api/v1/reviews/{self.review.id}/"
+        data, sql = self._get(url, "title")
+        self.assertEqual(data, {'title': "t"})
+        self.assertNotIn('"summary"', sql)
+
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get(url, "company_name,reviewer")[0], {'company_name': "c", 'reviewer': "sparse"})
+
+    def test_invalid(self):
+        for fields in ("", "title,ip_address"):
+            response = self.client.get("/api/v1/reviews/", {'fields': fields})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {
+                'fields': ["Choose from id, rating, title, summary, created_at, company_name, reviewer."]
+            })
+
+    def test_not_owned(self):
+        other = Review.objects.create(title="t", summary="s", rating=3, company_name="c",
+                                      reviewer=User.objects.create(username="sparse2"))
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{other.id}/", {'fields': "title"}).status_code, 403)
+
+
+class ValuesSerializerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="values ű")
+        Review.objects.create(title="árvíztűrő", summary="line\n\"quoted\" \u2028", rating=1, company_name="c",
+                              reviewer=user)
+        Review.objects.create(title="t", summary="s" * 10000, rating=5, company_name="c" * 255, reviewer=user)
+        whole_second = Review.objects.create(title="t", summary="s", rating=3, company_name="c", reviewer=user)
+        Review.objects.filter(id=whole_second.id).update(created_at=whole_second.created_at.replace(microsecond=0))
+
+    def _assert_parity(self):
+        queryset = Review.objects.all()
+        expected = JSONRenderer().render(ReviewSerializer(queryset.select_related("reviewer"), many=True).data)
+        self.assertEqual(JSONRenderer().render(review_values_serializer.serialize(queryset)), expected)
+
+    def test_parity(self):
+        self._assert_parity()
+
+    def test_parity_in_other_time_zone(self):
+        with timezone.override("America/St_Johns"):
+            self._assert_parity()
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            review_values_serializer.serialize(Review.objects.all())
+
+
+class ReviewFilterTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="filter")
+        cls.token = Token.objects.create(user=cls.user)
+        now = timezone.now()
+        for i, (company_name, rating) in enumerate([("a", 1), ("a", 5), ("b", 3), ("b", 4), ("c", 5)]):
+            review = Review.objects.create(title="t", summary="s", rating=rating, company_name=company_name,
+                                           reviewer=cls.user)
+            Review.objects.filter(id=review.id).update(created_at=now - td(days=i))
+        Review.objects.create(title="t", summary="s", rating=5, company_name="a",
+                              reviewer=User.objects.create(username="filter2"))
+        cls.now = now
+
+    def _filter(self, **params):
+        response = self.client.get("/api/v1/reviews/", params)
+        self.assertEqual(response.status_code, 200)
+        return [(r['company_name'], r['rating']) for r in response.json()['results']]
+
+    def test_filters(self):
+        self.assertEqual(self._filter(company_name="a"), [("a", 1), ("a", 5)])
+        self.assertEqual(self._filter(rating=5), [("a", 5), ("c", 5)])
+        self.assertEqual(self._filter(rating_min=3, rating_max=4), [("b", 3), ("b", 4)])
+        self.assertEqual(self._filter(rating_min=4, company_name="b"), [("b", 4)])
+        self.assertEqual(self._filter(created_after=(self.now - td(days=1)).isoformat()), [("a", 1), ("a", 5)])
+        self.assertEqual(self._filter(created_before=(self.now - td(days=3)).isoformat()), [("c", 5)])
+        self.assertEqual(self._filter(company_name="nope"), [])
+
+    def test_invalid_filters(self):
+        for params, field in [({'rating': 6}, "rating"), ({'rating_min': "x"}, "rating_min"),
+                              ({'rating_min': 4, 'rating_max': 2}, "rating_max"),
+                              ({'created_after': "yesterday"}, "created_after"),
+                              ({'created_after': self.now.isoformat(), 'created_before': self.now.isoformat()},
+                               "created_before")]:
+            response = self.client.get("/api/v1/reviews/", params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.json())
+
+    def _query_plan(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/api/v1/reviews/", params).status_code, 200)
+        page_query = next(q['sql'] for q in queries.captured_queries if "ORDER BY" in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + page_query)
+            return " ".join(row[-1] for row in cursor.fetchall())
+
+    def test_query_plans(self):
+        before = (self.now - td(days=1)).isoformat()
+        for params, index in [({}, "review_reviewer_created_idx"),
+                              ({'company_name': "a"}, "review_reviewer_company_idx"),
+                              ({'rating': 5}, "review_reviewer_rating_idx"),
+                              ({'created_before': before}, "review_reviewer_created_idx")]:
+            plan = self._query_plan(**params)
+            self.assertRegex(plan, f"USING (COVERING )?INDEX {index} ")
+            self.assertNotIn("TEMP B-TREE", plan)
+
+        self.assertRegex(self._query_plan(rating_min=2, rating_max=4),
+                         r"INDEX review_reviewer_rating_idx \(reviewer_id=\? AND rating>\? AND rating<\?\)")
+
+
+class MetricsTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="metrics")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        registry._reset()
+
+    def _metrics(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        return response.content.decode().splitlines()
+
+    def test_request_metrics(self):
+        self.client.get("/api/v1/reviews/")
+        self.client.get("/api/v1/reviews/")
+        self.client.get("/api/v1/reviews/12345/")
+        self.client.get("/not-found/")
+        lines = self._metrics()
+
+        route = 'route="review.views.ReviewList"'
+        self.assertIn(f'review_http_requests_total{{{route},method="GET",status="200"}} 2', lines)
+        self.assertIn('review_http_requests_total{route="review.views.ReviewDetail",method="GET",status="404"} 1',
+                      lines)
+        self.assertIn('review_http_requests_total{route="unmatched",method="GET",status="404"} 1', lines)
+        # token, ETag and the page, then the token is cached
+        self.assertIn(f'review_http_db_queries_total{{{route}}} 5', lines)
+        self.assertIn(f'review_http_request_duration_seconds_bucket{{{route},le="+Inf"}} 2', lines)
+        self.assertIn(f'review_http_request_duration_seconds_count{{{route}}} 2', lines)
+        empty_page = len(self.client.get("/api/v1/reviews/").content)
+        self.assertIn(f'review_http_response_size_bytes_bucket{{{route},le="100"}} 2', lines)
+        self.assertIn(f'review_http_response_size_bytes_sum{{{route}}} {2 * empty_page}', lines)
+
+    def test_forbidden(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code, 403)
+
+    def test_multiple_processes(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0):
+            self.client.get("/api/v1/reviews/")
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            with open(os.path.join(directory, "metrics-1-1.json"), "w") as f:
+                json.dump({
+                    'counters': [["review_http_requests_total",
+                                  [["route", "review.views.ReviewList"], ["method", "GET"], ["status", 200]], 3]],
+                    'histograms': [],
+                }, f)
+
+            lines = self._metrics()
+            self.assertIn('review_http_requests_total{route="review.views.ReviewList",method="GET",status="200"} 4',
+                          lines)
+
+
+class ReviewIngestQueueTestCase(AuthenticatedTestCase):
+    REVIEW_PAYLOAD = {'rating': 4, 'title': "queued", 'summary': "ok", 'company_name': "acme"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="queued")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(REVIEW_INGEST_QUEUE=True, REVIEW_INGEST_FLUSH_INTERVAL=0,
+                                     REVIEW_INGEST_SPOOL=os.path.join(directory.name, "ingest.db"))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _enqueue(self, **data):
+        response = self.client.post("/api/v1/reviews/", dict(self.REVIEW_PAYLOAD, **data), format="json")
+        self.assertEqual(response.status_code, 202)
+        return response
+
+    def _flush(self):
+        out = StringIO()
+        call_command("flush_review_queue", stdout=out)
+        return out.getvalue().strip()
+
+    def test_enqueue_and_flush(self):
+        response = self._enqueue()
+        tracking_id = response.json()['id']
+        self.assertEqual(response.json()['status'], "pending")
+        self.assertTrue(response["Location"].endswith(f"/api/v1/reviews/queue/{tracking_id}/"))
+        self.assertFalse(Review.objects.exists())
+
+        status = self.client.get(response["Location"]).json()
+        self.assertEqual(status, {'id': tracking_id, 'status': "pending", 'review': None, 'errors': None})
+        self._enqueue(rating=2)
+        self.assertEqual(self.client.get("/api/v1/reviews/queue/").json(), {'pending': 2, 'failed': 0})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(review_queue.flush(), 2)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "review_review"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self._flush(), "Flushed 0 queued review(s).")
+
+        review = Review.objects.get(ingest_id=tracking_id)
+        self.assertEqual((review.reviewer, review.ip_address, review.rating), (self.user, "127.0.0.1", 4))
+        status = self.client.get(response["Location"]).json()
+        self.assertEqual(status, {'id': tracking_id, 'status': "created", 'review': review.id, 'errors': None})
+        self.assertEqual(self.client.get("/api/v1/reviews/queue/").json(), {'pending': 0, 'failed': 0})
+        self.assertEqual(CompanyRating.objects.get(company_name="acme").review_count, 2)
+
+    def test_invalid(self):
+        response = self.client.post("/api/v1/reviews/", dict(self.REVIEW_PAYLOAD, rating=6), format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/reviews/queue/").json(), {'pending': 0, 'failed': 0})
+
+    def test_survives_restart(self):
+        first = self._enqueue().json()['id']
+        second = self._enqueue().json()['id']
+        # the first one made it into the database but its flusher died before removing it from the spool
+        Review.objects.create(reviewer=self.user, ingest_id=first, **self.REVIEW_PAYLOAD)
+
+        self.assertEqual(ReviewQueue().flush(), 2)
+        self.assertEqual(Review.objects.filter(ingest_id__in=[first, second]).count(), 2)
+        self.assertEqual(self._flush(), "Flushed 0 queued review(s).")
+
+    def test_other_reviewer(self):
+        location = self._enqueue()["Location"]
+        other = Token.objects.create(user=User.objects.create(username="other"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {other.key}")
+        self.assertEqual(self.client.get(location).status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/reviews/queue/").json(), {'pending': 0, 'failed': 0})
+
+
+class ReviewIngestFlusherTestCase(TransactionTestCase):
+    """
+    The flusher runs in its own thread, with its own database connection, so the data has to be committed.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(REVIEW_INGEST_QUEUE=True, REVIEW_INGEST_FLUSH_INTERVAL=0,
+                                     REVIEW_INGEST_SPOOL=os.path.join(directory.name, "ingest.db"))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create(username="restarted")
+
+    def test_started_by_request(self):
+        # accepted before a restart, without a flusher
+        tracking_id = ReviewQueue().enqueue(self.user.id, "127.0.0.1", ReviewIngestQueueTestCase.REVIEW_PAYLOAD)
+
+        queue = ReviewQueue()
+        self.addCleanup(queue.stop)
+        with mock.patch("review.signals.review_queue", queue), override_settings(REVIEW_INGEST_FLUSH_INTERVAL=0.01):
+            self.client.get("/api/v1/")
+            # the spool is watched instead of the reviews, the in-memory test database is locked while it's written
+            for _ in range(500):
+                if queue.summary(self.user.id) == {'pending': 0, 'failed': 0}:
+                    break
+                time.sleep(0.01)
+            queue.stop()
+        self.assertEqual(Review.objects.get(ingest_id=tracking_id).reviewer, self.user)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(AuthenticatedTestCase):
+    multi_db = True
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="replicated")
+        cls.token = Token.objects.create(user=cls.user)
+        User.objects.using("replica").create(id=cls.user.id, username=cls.user.username)
+        # the replica lags behind, each database has a review the other one doesn't
+        cls.primary = Review.objects.create(title="primary", summary="s", rating=3, company_name="c",
+                                            reviewer=cls.user)
+        Review.objects.using("replica").bulk_create([
+            Review(id=cls.primary.id + 1000, title="replica", summary="s", rating=3, company_name="c",
+                   reviewer=cls.user),
+        ])
+        cls.replica = Review.objects.using("replica").get()
+
+    def _titles(self):
+        return [review['title'] for review in self.client.get("/api/v1/reviews/").json()['results']]
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self._titles(), ["replica"])
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.replica.id}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.primary.id}/").status_code, 404)
+        # other views read from the primary
+        response = self.client.get("/api/v1/reviews/export/", HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual([json.loads(line)['title'] for line in response.streaming_content], ["primary"])
+
+    def test_read_your_writes(self):
+        response = self.client.post("/api/v1/reviews/", {'rating': 5, 'title': "new", 'summary': "s",
+                                                         'company_name': "c"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._titles(), ["new", "primary"])
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.primary.id}/").status_code, 200)
+
+        # failed writes don't pin
+        cache.clear()
+        self.client.post("/api/v1/reviews/", {'rating': 6}, format="json")
+        self.assertEqual(self._titles(), ["replica"])
+
+    @override_settings(REVIEW_READ_YOUR_WRITES_WINDOW=0)
+    def test_window_disabled(self):
+        self.client.post("/api/v1/reviews/", {'rating': 5, 'title': "new", 'summary': "s", 'company_name': "c"},
+                         format="json")
+        self.assertEqual(self._titles(), ["replica"])
+
+    def test_writes_go_to_primary(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_write(Review), "default")
+        self.assertIsNone(router.db_for_read(Review))
+        self.assertTrue(router.allow_relation(self.replica, self.user))
+
+    @override_settings(REVIEW_CACHE_DATABASE="archive", REVIEW_CACHE_ALIAS="shared", CACHES={
+        'default': {'BACKEND': "django.core.cache.backends.locmem.LocMemCache"},
+        'shared': {'BACKEND': "django.core.cache.backends.db.DatabaseCache", 'LOCATION': "review_cache"},
+    })
+    def test_separate_cache_database(self):
+        call_command("createcachetable", database="default")
+        call_command("createcachetable", database="archive")
+        self.assertNotIn("review_cache", connections["default"].introspection.table_names())
+
+        self.assertEqual(self.client.get(f"/api/v1/reviews/{self.replica.id}/").status_code, 200)
+        with connections["archive"].cursor() as cursor:
+            cursor.execute("SELECT cache_key FROM review_cache")
+            self.assertEqual([key for key, in cursor.fetchall()], [f":1:review:representation:{self.replica.id}"])
+
+
+class SQLiteBackendTestCase(TestCase):
+    PRAGMAS = {'journal_mode': "WAL", 'synchronous': "NORMAL", 'busy_timeout': 1234, 'mmap_size': 4096,
+               'cache_size': -2048}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "review.db")
+        self.connection = ConnectionHandler({'default': {
+            'ENGINE': "review.backends.sqlite3",
+            'NAME': self.path,
+            'OPTIONS': {'pragmas': self.PRAGMAS, 'immediate_transactions': True},
+        }})['default']
+        self.addCleanup(self.connection.close)
+
+    def test_pragmas(self):
+        with self.connection.cursor() as cursor:
+            values = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in self.PRAGMAS}
+        self.assertEqual(values, {'journal_mode': "wal", 'synchronous': 1, 'busy_timeout': 1234, 'mmap_size': 4096,
+                                  'cache_size': -2048})
+
+    def test_immediate_transactions(self):
+        self.connection.ensure_connection()
+        self.connection._start_transaction_under_autocommit()
+        self.addCleanup(self.connection.connection.rollback)
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+            other.execute("BEGIN IMMEDIATE")
+
+
+@skipIf(msgpack is None, "msgpack is not installed")
+class MessagePackTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="msgpack")
+        cls.token = Token.objects.create(user=cls.user)
+        Review.objects.create(title="t", summary="s", rating=3, company_name="c", reviewer=cls.user)
+
+    def test_list(self):
+        response = self.client.get("/api/v1/reviews/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), self.client.get("/api/v1/reviews/").json())
+        self.assertNotEqual(response["ETag"], self.client.get("/api/v1/reviews/")["ETag"])
+
+    def test_create(self):
+        data = {'rating': 5, 'title': "packed", 'summary': "ok", 'company_name': "c"}
+        response = self.client.post("/api/v1/reviews/", msgpack.packb(data), content_type="application/msgpack",
+                                    HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content, raw=False)['title'], "packed")
+
+    def test_invalid(self):
+        response = self.client.post("/api/v1/reviews/", b"\xc1", content_type="application/msgpack")
+        self.assertEqual(response.status_code, 400)
+
+    def test_uuid(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(REVIEW_INGEST_QUEUE=True, REVIEW_INGEST_FLUSH_INTERVAL=0,
+                                  REVIEW_INGEST_SPOOL=os.path.join(directory, "ingest.db")):
+            response = self.client.post("/api/v1/reviews/", {'rating': 5, 'title': "t", 'summary': "s",
+                                                             'company_name': "c"},
+                                        format="json", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(msgpack.unpackb(response.content, raw=False)['id']), 36)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=500)
+class CompressionTestCase(AuthenticatedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="compressed")
+        cls.token = Token.objects.create(user=cls.user)
+        cls.review = Review.objects.create(title="t", summary="words " * 200, rating=3, company_name="c",
+                                           reviewer=cls.user)
+
+    def test_gzip(self):
+        plain = self.client.get("/api/v1/reviews/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        response = self.client.get("/api/v1/reviews/", HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(response["ETag"], f"W/{plain['ETag']}")
+
+        response = self.client.get("/api/v1/reviews/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        plain = self.client.get("/api/v1/reviews/")
+        response = self.client.get("/api/v1/reviews/", HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+        response = self.client.get("/api/v1/reviews/export/", HTTP_ACCEPT_ENCODING="br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(json.loads(brotli.decompress(b"".join(response.streaming_content)))['id'], self.review.id)
+
+    def test_below_threshold(self):
+        response = self.client.get("/api/v1/reviews/", {'fields': "id"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming(self):
+        response = self.client.get("/api/v1/reviews/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        row = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(row['id'], self.review.id)
+
+
+class ReviewAdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        now = timezone.now()
+        for title, company_name, days in (("Great pizza", "Luigi", 0), ("Cold coffee", "Bean", 40),
+                                          ("Pizza again", "Mario", 400)):
+            review = Review.objects.create(title=title, summary="s", rating=3, company_name=company_name,
+                                           reviewer=cls.admin)
+            Review.objects.filter(id=review.id).update(created_at=now - td(days=days))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def _get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/admin/review/review/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_not_compressed(self):
+        # the page has the CSRF token and the search term, see review.compression
+        response = self.client.get("/admin/review/review/", {'q': "pizza"}, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(response.content), settings.COMPRESSION_MIN_SIZE)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_changelist(self):
+        response, queries = self._get()
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        self.assertFalse(any('COUNT(' in sql and '"review_review"' in sql for sql in queries))
+        # the reviewers are joined to the page
+        self.assertEqual(len([sql for sql in queries if 'FROM "review_review"' in sql and "auth_user" in sql]), 1)
+
+        # the number of archived reviews and the date hierarchy come from the cache the second time
+        second_response, second_queries = self._get()
+        self.assertEqual(len(second_queries), len(queries) - 3)
+        self.assertContains(second_response, "?created_at__year=")
+
+    def test_filtered_count(self):
+        year = timezone.now().year
+        response, queries = self._get(created_at__year=year)
+        count = response.context['cl'].result_count
+        self.assertEqual(count, Review.objects.filter(created_at__year=year).count())
+        self.assertEqual(len([sql for sql in queries if sql.startswith('SELECT COUNT(*)')]), 1)
+
+        response, queries = self._get(created_at__year=year)
+        self.assertEqual(response.context['cl'].result_count, count)
+        self.assertFalse([sql for sql in queries if sql.startswith('SELECT COUNT(*)')])
+
+    def test_search(self):
+        response, queries = self._get(q="pizz")
+        self.assertEqual(sorted(review.title for review in response.context['cl'].result_list),
+                         ["Great pizza", "Pizza again"])
+        self.assertTrue(any("MATCH" in sql for sql in queries))
+        self.assertEqual([review.title for review in self._get(q="bea")[0].context['cl'].result_list],
+                         ["Cold coffee"])
+        self.assertEqual(len(self._get(q="summary")[0].context['cl'].result_list), 0)
+
+
+class ASGIApplicationTestCase(TransactionTestCase):
+    """
+    The requests run in the threads of the pool, with their own database connections, so the data has to be
+    committed.
+    """
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create(username="asgi")
+        self.token = Token.objects.create(user=self.user)
+        self.application = ASGIApplication(get_wsgi_application(), threads=2)
+        self.addCleanup(self.application.executor.shutdown)
+
+    def _request(self, method, path, body_chunks=(b"", ), query_string=b"", headers=()):
+        scope = {
+            'type': "http", 'http_version': "1.1", 'method': method, 'path': path, 'query_string': query_string,
+            'headers': [(b"authorization", f"Token {self.token.key}".encode()), (b"host", b"testserver"),
+                        *headers],
+            'server': ("localhost", 80), 'client': ("127.0.0.1", 12345),
+        }
+        messages = [
+            {'type': "http.request", 'body': chunk, 'more_body': index < len(body_chunks) - 1}
+            for index, chunk in enumerate(body_chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.get_event_loop().run_until_complete(self.application(scope, receive, send))
+        start, *body = sent
+        self.assertFalse(body[-1].get('more_body', False))
+        return start['status'], dict(start['headers']), b"".join(message['body'] for message in body)
+
+    def test_create_and_list(self):
+        payload = json.dumps({'rating': 5, 'title': "asgi", 'summary': "ok", 'company_name': "szia"}).encode()
+        status, headers, body = self._request(
+            "POST", "/api/v1/reviews/", [payload[:10], payload[10:]],
+            headers=[(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        )
+        self.assertEqual(status, 201, body)
+        self.assertEqual(Review.objects.get().ip_address, "127.0.0.1")
+
+        status, headers, body = self._request("GET", "/api/v1/reviews/", query_string=b"fields=title")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-type"], b"application/json")
+        self.assertEqual(json.loads(body)['results'], [{'title': "asgi"}])
+
+    def test_streaming(self):
+        for i in range(3):
+            Review.objects.create(title=f"t{i}", summary="s", rating=3, company_name="c", reviewer=self.user)
+        status, headers, body = self._request("GET", "/api/v1/reviews/export/", query_string=b"format=ndjson")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_not_found(self):
+        self.assertEqual(self._request("GET", "/api/v1/reviews/12345/")[0], 404)
+
+
+class DocsSchemaTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "schema.json")
+        settings = override_settings(REVIEW_SCHEMA_PATH=self.path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema_cache.clear()
+        self.addCleanup(schema_cache.clear)
+
+    def test_build_schema(self):
+        with self.assertRaisesMessage(CommandError, "is missing or out of date"):
+            call_command("build_schema", "--check", stdout=StringIO())
+        call_command("build_schema", stdout=StringIO())
+        call_command("build_schema", "--check", stdout=StringIO())
+
+        with mock.patch("review.schema.generate_schema") as generate_schema:
+            response = self.client.get("/docs/")
+            self.assertEqual(self.client.get("/docs/schema.js").status_code, 200)
+        generate_schema.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Review API")
+        self.assertContains(response, "api/v1/reviews/changes/")
+        self.assertEqual(response["Cache-Control"], "private, max-age=86400")
+
+    def test_out_of_date(self):
+        call_command("build_schema", stdout=StringIO())
+        with open(self.path, "rb") as f:
+            built = f.read()
+        write_schema(self.path, coreapi.Document(title="Old API"), "other sources")
+        with self.assertRaisesMessage(CommandError, "is missing or out of date"):
+            call_command("build_schema", "--check", stdout=StringIO())
+
+        # the first request generates and writes it
+        response = self.client.get("/docs/?format=corejson")
+        self.assertContains(response, "api/v1/reviews/changes/")
+        call_command("build_schema", "--check", stdout=StringIO())
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), built)
+
+        # so do the settings the schema depends on
+        with override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, PAGE_SIZE=10)):
+            with self.assertRaisesMessage(CommandError, "is missing or out of date"):
+                call_command("build_schema", "--check", stdout=StringIO())
+
+    def test_not_modified(self):
+        response = self.client.get("/docs/")
+        self.assertEqual(self.client.get("/docs/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        # the token changes the docs, so does the format
+        other = self.client.get("/docs/", HTTP_IF_NONE_MATCH=response["ETag"], HTTP_AUTHORIZATION="Token x")
+        self.assertEqual(other.status_code, 401)
+        other = self.client.get("/docs/?format=corejson", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other["ETag"], response["ETag"])
+        self.assertIn("Authorization", response["Vary"])
+
+        # changed sources which generate the same schema keep the ETag, a changed schema gets a new one
+        schema_cache.clear()
+        with mock.patch("review.schema.source_hash", return_value="changed sources"):
+            self.assertEqual(self.client.get("/docs/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        schema_cache.clear()
+        with mock.patch("review.schema.source_hash", return_value="changed again"), \
+                mock.patch("review.schema.generate_schema", return_value=coreapi.Document(title="Changed API")):
+            changed = self.client.get("/docs/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(changed, "Changed API")
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+
+class SeedReviewsTestCase(TestCase):
+    def test_seed(self):
+        call_command("seed_reviews", users=3, reviews=50, companies=5, batch_size=20, seed=1, stdout=StringIO())
+        users = User.objects.filter(username__startswith="seed-")
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Token.objects.filter(user__in=users).count(), 3)
+        self.assertEqual(Review.objects.count(), 50)
+        self.assertLessEqual(Review.objects.values("company_name").distinct().count(), 5)
+        self.assertLess(Review.objects.earliest("created_at").created_at, timezone.now() - td(days=1))
+        call_command("rebuild_company_ratings", "--check", stdout=StringIO())
+
+        # with no users the existing ones are reused
+        call_command("seed_reviews", users=0, reviews=10, seed=2, stdout=StringIO())
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Review.objects.count(), 60)
+
+    def test_no_users(self):
+        with self.assertRaisesMessage(CommandError, "There are no users to create the reviews for."):
+            call_command("seed_reviews", users=0, reviews=10, prefix="nobody", stdout=StringIO())
@@ -3,16 +3,24 @@ from django.conf.urls import url
 from django.urls import include, path
 from django.contrib import admin
 
-from rest_framework.documentation import include_docs_urls
-
 from review import views
+from review.schema import docs_urls
 
 
 urlpatterns = [
     path(settings.ADMIN_URL, admin.site.urls),
     path("api/v1/reviews/", views.ReviewList.as_view()),
     path("api/v1/reviews/<int:pk>/", views.ReviewDetail.as_view()),
-    url(r'^docs/', include_docs_urls(title="Review API"))
+    path("api/v1/reviews/bulk/", views.ReviewBulkCreate.as_view()),
+    path("api/v1/reviews/batch/", views.ReviewBatchRetrieve.as_view()),
+    path("api/v1/reviews/changes/", views.ReviewChanges.as_view()),
+    path("api/v1/reviews/export/", views.ReviewExport.as_view()),
+    path("api/v1/reviews/queue/", views.ReviewIngestSummary.as_view()),
+    path("api/v1/reviews/queue/<uuid:tracking_id>/", views.ReviewIngestStatus.as_view(), name="review-ingest-status"),
+    path("api/v1/reviews/search/", views.ReviewSearch.as_view()),
+    path("api/v1/companies/<path:company_name>/rating/", views.CompanyRatingDetail.as_view()),
+    path("metrics", views.metrics),
+    url(r'^docs/', docs_urls())
 ]
 
 
@@ -1,37 +1,437 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveAPIView
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from review.models import Review
-from review.serializers import ReviewSerializer
+from review.cache import REVIEWER_FIELD, get_representations, set_representations
+from review.etags import review_detail_etag, review_list_etag
+from review.filters import ReviewFilterBackend
+from review.idempotency import idempotent
+from review.ingest import review_queue
+from review.metrics import registry
+from review.models import ArchivedReview, CompanyRating, Review, ReviewChange
+from review.serializers import (
+    CompanyRatingSerializer, ReviewChangeSerializer, ReviewSerializer, review_values_serializer
+)
 from review.permissions import IsReviewer
+from review.renderers import CSVRenderer, NDJSONRenderer
+from review.routers import replica_reads
+from review.search import search_reviews
 from review.utils import get_ip_address_from_request
 
 
-class ReviewList(ListCreateAPIView):
+class SparseFieldsMixin:
+    """
+    Lets the client choose the returned fields with the comma separated ``fields`` query parameter.
+    """
+
+    def get_fields(self):
+        value = self.request.query_params.get("fields")
+        if value is None:
+            return None
+
+        fields = [name.strip() for name in value.split(",") if name.strip()]
+        allowed = self.serializer_class.Meta.fields
+        unknown = [name for name in fields if name not in allowed]
+        if not fields or unknown:
+            raise ValidationError({'fields': [f"Choose from {', '.join(allowed)}."]})
+        return fields
+
+    def get_values_serializer(self, archived=False):
+        fields = self.get_fields()
+        if archived:
+            # the users are not in a separate archive database, get_representations fills in the reviewer
+            fields = [name for name in fields or self.serializer_class.Meta.fields if name != REVIEWER_FIELD]
+        elif fields is None:
+            return review_values_serializer
+        # only the requested columns are read, the id is needed to match the rows to the reviews
+        return review_values_serializer.only(["id", *fields])
+
+    def get_columns(self, fields):
+        """
+        Return the model fields read by the given serializer fields.
+        """
+        serializer_fields = self.serializer_class().fields
+        model_fields = {field.name for field in self.serializer_class.Meta.model._meta.concrete_fields}
+        return [serializer_fields[name].source for name in fields if serializer_fields[name].source in model_fields]
+
+
+@method_decorator(replica_reads, name="get")
+@method_decorator(condition(etag_func=review_list_etag), name="get")
+class ReviewList(SparseFieldsMixin, ListCreateAPIView):
     """
     get:
     List all reviews submitted by the user.
+    The returned fields can be chosen with the comma separated `fields` query parameter, e.g. `fields=id,title`.
+    The archived (old) reviews are listed with `archived=true`.
 
     post:
     Create a new review.
+    When the ingest queue is enabled the review is created in the background and the response is
+    `202 Accepted` with a tracking id, its progress can be followed at the URL in the `Location` header.
+    A retry with the same `Idempotency-Key` header as the original request gets the original response back
+    instead of creating the review again.
     """
 
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthenticated, )
+    filter_backends = (ReviewFilterBackend, )
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        if not settings.REVIEW_INGEST_QUEUE:
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ip_address = get_ip_address_from_request(request)
+        tracking_id = review_queue.enqueue(request.user.pk, ip_address, serializer.validated_data)
+        location = reverse("review-ingest-status", kwargs={'tracking_id': tracking_id}, request=request)
+        return Response({'id': tracking_id, 'status': "pending"}, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
 
     def perform_create(self, serializer):
         ip_address = get_ip_address_from_request(self.request)
         serializer.save(reviewer=self.request.user, ip_address=ip_address)
+        set_representations([serializer.data], self.request.user)
 
     def get_queryset(self):
-        return Review.objects.filter(reviewer=self.request.user).select_related("reviewer")
+        model = ArchivedReview if self.is_archived() else Review
+        return model.objects.filter(reviewer=self.request.user)
+
+    def is_archived(self):
+        value = self.request.query_params.get("archived", "false")
+        if value not in ("true", "false"):
+            raise ValidationError({'archived': ["Must be true or false."]})
+        return value == "true"
+
+    def list(self, request, *args, **kwargs):
+        # only the columns needed by the pagination are read, the rest comes from the cache
+        queryset = self.filter_queryset(self.get_queryset()).only("id", "created_at")
+        page = self.paginate_queryset(queryset)
+        reviews = page if page is not None else queryset
+        data = get_representations([review.id for review in reviews], request.user, self.serialize, self.get_fields())
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
+    def serialize(self, ids):
+        serializer = self.get_values_serializer(archived=self.is_archived())
+        return serializer.serialize(self.get_queryset().filter(id__in=ids).order_by())
 
-class ReviewDetail(RetrieveAPIView):
+
+@method_decorator(replica_reads, name="get")
+@method_decorator(condition(etag_func=review_detail_etag), name="get")
+class ReviewDetail(SparseFieldsMixin, RetrieveAPIView):
     """
-    Retrieve a single review
+    Retrieve a single review, the returned fields can be chosen with the comma separated `fields` query parameter,
+    e.g. `fields=id,title`. Archived reviews are retrieved as well.
     """
 
-    queryset = Review.objects.select_related("reviewer")
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthenticated, IsReviewer)
+
+    def get_queryset(self, model=Review, scoped=True):
+        queryset = model.objects.all()
+        if scoped:
+            # someone else's review is filtered out by the query, the reviewer is the requesting user so there is
+            # no need to join the users
+            queryset = queryset.filter(reviewer=self.request.user)
+        fields = self.get_fields()
+        if fields is not None:
+            # the reviewer is needed by the permission check
+            queryset = queryset.only("reviewer", *self.get_columns(fields))
+        return queryset
+
+    def get_object(self):
+        # a miss of the ETag lookup (which looks for the reviewer's review) isn't looked up again
+        try:
+            if not getattr(self.request, "review_found", True):
+                raise Http404
+            review = super().get_object()
+        except Http404:
+            review = self.get_archived_object()
+            self.check_object_permissions(self.request, review)
+        review.reviewer = self.request.user
+        return review
+
+    def get_archived_object(self):
+        # a miss is looked up in the archive, only the old reviews are there
+        pk = self.kwargs['pk']
+        if settings.REVIEW_DETAIL_FORBIDDEN_STATUS != status.HTTP_403_FORBIDDEN:
+            review = self.get_queryset(ArchivedReview).filter(pk=pk).first()
+        # someone else's review is told apart from a missing one when configured so, by the reviewer of the row
+        # (if any) of each table
+        elif Review.objects.filter(pk=pk).values_list("reviewer_id", flat=True).first() is not None:
+            self.permission_denied(self.request)
+        else:
+            # the permission check denies someone else's
+            review = self.get_queryset(ArchivedReview, scoped=False).filter(pk=pk).first()
+        if review is None:
+            raise Http404
+        return review
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        # without a row the ETag lookup found nothing: the review is archived, missing or someone else's
+        cached = getattr(request, "review_found", True)
+        return Response(get_representations([self.kwargs['pk']], request.user, self.serialize, fields, cached)[0])
+
+    def serialize(self, ids):
+        # a miss goes through the usual lookup and permission check
+        fields = self.get_fields()
+        if fields is not None:
+            fields = ["id", *fields]
+        return [self.get_serializer(self.get_object(), fields=fields).data]
+
+
+@method_decorator(replica_reads, name="get")
+class ReviewBatchRetrieve(SparseFieldsMixin, GenericAPIView):
+    """
+    get:
+    Retrieve multiple reviews of the user at once by the comma separated `ids` query parameter (up to 100 by
+    default). The reviews are returned in the order of the ids, the ones which don't exist (or belong to someone
+    else) are replaced by `{"id": <id>, "detail": "Not found."}`. The `fields` query parameter works like in the
+    review list.
+    """
+
+    serializer_class = ReviewSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = None
+
+    def get_queryset(self):
+        return Review.objects.filter(reviewer=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        fields = self.get_fields()
+        # the id is needed to put the reviews in place
+        found = get_representations(list(dict.fromkeys(ids)), request.user, self.serialize,
+                                    None if fields is None else ["id", *fields])
+        reviews = {data['id']: data for data in found}
+
+        results = []
+        for pk in ids:
+            if pk not in reviews:
+                results.append({'id': pk, 'detail': NotFound.default_detail})
+            elif fields is not None and "id" not in fields:
+                results.append({name: value for name, value in reviews[pk].items() if name != "id"})
+            else:
+                results.append(reviews[pk])
+        return Response({'results': results})
+
+    def get_ids(self):
+        value = self.request.query_params.get("ids", "")
+        try:
+            ids = [int(pk) for pk in value.split(",") if pk.strip()]
+        except ValueError:
+            raise ValidationError({'ids': ["Enter a comma separated list of integers."]})
+        if not ids:
+            raise ValidationError({'ids': ["This field is required."]})
+        limit = settings.REVIEW_BATCH_RETRIEVE_LIMIT
+        if len(ids) > limit:
+            raise ValidationError({'ids': [f"Ensure this list has no more than {limit} items."]})
+        return ids
+
+    def serialize(self, ids):
+        return self.get_values_serializer().serialize(self.get_queryset().filter(id__in=ids).order_by())
+
+
+class ReviewBulkCreate(GenericAPIView):
+    """
+    post:
+    Create multiple reviews at once, the payload is a list of reviews.
+    Nothing is created if any of them is invalid, the errors are reported with the index of the review.
+    """
+
+    serializer_class = ReviewSerializer
+    permission_classes = (IsAuthenticated, )
+
+    def post(self, request, *args, **kwargs):
+        limit = settings.REVIEW_BULK_CREATE_LIMIT
+        if isinstance(request.data, list) and len(request.data) > limit:
+            raise ValidationError({'non_field_errors': [f"Ensure this list has no more than {limit} items."]})
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            if isinstance(serializer.errors, dict):
+                raise ValidationError(serializer.errors)
+            errors = [{'index': index, 'errors': error} for index, error in enumerate(serializer.errors) if error]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        ip_address = get_ip_address_from_request(request)
+        reviews = [
+            Review(reviewer=request.user, ip_address=ip_address, **data) for data in serializer.validated_data
+        ]
+        Review.objects.bulk_create_and_record(reviews)
+
+        return Response({'count': len(reviews)}, status=status.HTTP_201_CREATED)
+
+
+class ReviewIngestSummary(GenericAPIView):
+    """
+    get:
+    Number of the user's reviews waiting in the ingest queue and of the ones which could not be created.
+    """
+
+    permission_classes = (IsAuthenticated, )
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        return Response(review_queue.summary(request.user.pk))
+
+
+class ReviewIngestStatus(GenericAPIView):
+    """
+    get:
+    Status of a review accepted by the ingest queue: `pending`, `created` (with the id of the review) or `failed`
+    (with the errors).
+    """
+
+    permission_classes = (IsAuthenticated, )
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        tracking_id = self.kwargs['tracking_id']
+        result = review_queue.status(request.user.pk, tracking_id)
+        if result is None:
+            raise NotFound()
+        return Response({'id': tracking_id, **result})
+
+
+class ReviewChanges(GenericAPIView):
+    """
+    get:
+    Feed of the created and deleted reviews of the user, oldest first. It returns the changes after the `cursor`
+    query parameter (all of them without it) under `results`, at most `limit` of them (100 by default, at most
+    1000), the `cursor` to send with the next request and whether there are `more` changes right away.
+    With `wait` (seconds, at most 30 by default) the request waits for a change when there is none yet.
+    """
+
+    serializer_class = ReviewChangeSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = None
+    default_limit = 100
+    max_limit = 1000
+
+    def get_queryset(self):
+        return ReviewChange.objects.filter(reviewer=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        cursor = self.get_integer("cursor", 0, minimum=0)
+        limit = min(self.get_integer("limit", self.default_limit, minimum=1), self.max_limit)
+        wait = min(self.get_integer("wait", 0, minimum=0), settings.REVIEW_CHANGES_MAX_WAIT)
+
+        # an indexed range query of the reviewer's changes, cheap enough to repeat while waiting
+        deadline = time.monotonic() + wait
+        while True:
+            changes = list(self.get_queryset().filter(id__gt=cursor)[:limit + 1])
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                break
+            time.sleep(min(settings.REVIEW_CHANGES_POLL_INTERVAL, remaining))
+
+        more = len(changes) > limit
+        changes = changes[:limit]
+        if changes:
+            cursor = changes[-1].id
+        return Response({'cursor': cursor, 'more': more, 'results': self.get_serializer(changes, many=True).data})
+
+    def get_integer(self, name, default, minimum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: ["A valid integer is required."]})
+        if value < minimum:
+            raise ValidationError({name: [f"Ensure this value is greater than or equal to {minimum}."]})
+        return value
+
+
+class ReviewExport(GenericAPIView):
+    """
+    get:
+    Export all reviews submitted by the user as newline delimited JSON or CSV.
+    The format is selected with the `Accept` header or the `format` query parameter (`ndjson` or `csv`).
+    """
+
+    serializer_class = ReviewSerializer
+    permission_classes = (IsAuthenticated, )
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    pagination_class = None
+
+    def get_queryset(self):
+        return Review.objects.filter(reviewer=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+
+        rows = renderer.render_rows(self.iter_rows(), ReviewSerializer.Meta.fields)
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="reviews.{renderer.format}"'
+        return response
+
+    def iter_rows(self):
+        rows = review_values_serializer.rows(self.get_queryset())
+        for row in rows.iterator(chunk_size=settings.REVIEW_EXPORT_CHUNK_SIZE):
+            yield review_values_serializer.to_representation(row)
+
+
+class CompanyRatingDetail(RetrieveAPIView):
+    """
+    Retrieve the average rating, the number of reviews and the rating histogram of a company
+    """
+
+    queryset = CompanyRating.objects.all()
+    serializer_class = CompanyRatingSerializer
+    permission_classes = (IsAuthenticated, )
+    lookup_field = "company_name"
+
+
+class ReviewSearch(GenericAPIView):
+    """
+    get:
+    Full-text search in the title, summary and company name of the reviews submitted by the user.
+    The results are ordered by relevance, `limit` sets the number of results (20 by default, at most 100).
+    """
+
+    serializer_class = ReviewSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = None
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({'q': ["This field is required."]})
+
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': ["A valid integer is required."]})
+        if limit < 1:
+            raise ValidationError({'limit': ["Ensure this value is greater than or equal to 1."]})
+
+        reviews = search_reviews(request.user, query, limit)
+        return Response({'results': self.get_serializer(reviews, many=True).data})
+
+
+def metrics(request):
+    """
+    Request metrics in the Prometheus text format, see review.metrics
+    """
+    if get_ip_address_from_request(request) not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")